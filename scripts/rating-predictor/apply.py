@@ -5,21 +5,33 @@ Apply predictions from predictions.json to taxonomy files.
 
 import argparse
 import json
-from core.utils import load_predictions, get_taxonomy_files
-
-
-def apply_rating_to_problems(problems, predictions):
-    """Apply predictions to a list of problems."""
-    updated = 0
-    for prob in problems:
-        if prob.get("is_predicted") is True or prob.get("rating") is None:
-            slug = prob["slug"]
-            if slug in predictions:
-                pred = predictions[slug]
-                prob["rating"] = pred["predicted_rating"]
-                prob["is_predicted"] = True
-                updated += 1
-    return updated
+from core.utils import load_predictions, get_taxonomy_files, write_json_atomic
+from core.taxonomy_index import (
+    TaxonomyIndex,
+    needs_prediction,
+    get_problem_list,
+    location_label,
+    file_sha256,
+)
+
+
+def plan_changes(index, predictions):
+    """
+    Find every occurrence whose rating would change.
+
+    Returns:
+        Dict mapping file name -> list of (slug, location, new_rating)
+    """
+    changes = {}
+    for slug, pred in predictions.items():
+        new_rating = pred["predicted_rating"]
+        for name, loc in index.locations(slug):
+            if not needs_prediction(loc):
+                continue
+            rating, is_predicted = loc[4], loc[5]
+            if rating != new_rating or not is_predicted:
+                changes.setdefault(name, []).append((slug, loc, new_rating))
+    return changes
 
 
 def cmd_apply(args):
@@ -28,6 +40,8 @@ def cmd_apply(args):
     print(f"Loaded {len(predictions)} predictions from cache.")
     print()
 
+    index = TaxonomyIndex.load()
+    changes = plan_changes(index, predictions)
     total_updated = 0
 
     for filepath in get_taxonomy_files():
@@ -35,39 +49,54 @@ def cmd_apply(args):
             print(f"Warning: {filepath.name} not found.")
             continue
 
-        print(f"Processing {filepath.name}...")
+        file_changes = changes.get(filepath.name)
+        if not file_changes:
+            print(f"No updates needed in {filepath.name}")
+            continue
 
+        print(f"Processing {filepath.name}...")
         with open(filepath, 'r') as f:
             taxonomy = json.load(f)
 
-        updated = 0
-
-        for topic in taxonomy:
-            for section in topic.get('sections', []):
-                # Direct problems
-                updated += apply_rating_to_problems(section.get('problems', []), predictions)
-                # Subtopics
-                for sub in section.get('subtopics', []):
-                    updated += apply_rating_to_problems(sub.get('problems', []), predictions)
-
-        if updated > 0:
-            print(f"  Updated {updated} problems in {filepath.name}")
-            total_updated += updated
-            with open(filepath, 'w') as f:
-                json.dump(taxonomy, f, indent=2)
+        for slug, (topic, section, subtopic, pos, rating, _), new_rating in file_changes:
+            prob = get_problem_list(taxonomy, topic, section, subtopic)[pos]
+            if prob["slug"] != slug:
+                raise RuntimeError(f"Taxonomy index is stale for {filepath.name}; delete it and re-run.")
+            if args.dry_run:
+                where = location_label(taxonomy, topic, section, subtopic)
+                print(f"  {where}: {slug} {rating} -> {new_rating}")
+            prob["rating"] = new_rating
+            prob["is_predicted"] = True
+
+        updated = len(file_changes)
+        total_updated += updated
+        if args.dry_run:
+            print(f"  Would update {updated} problems in {filepath.name}")
         else:
-            print(f"  No updates needed in {filepath.name}")
+            write_json_atomic(filepath, taxonomy, indent=2)
+            index.update_file(filepath.name, taxonomy, file_sha256(filepath))
+            print(f"  Updated {updated} problems in {filepath.name}")
+
+    if total_updated and not args.dry_run:
+        index.save()
 
     print()
-    if total_updated > 0:
+    if total_updated > 0 and args.dry_run:
+        print(f"Dry run: {total_updated} predictions would be applied. No files were written.")
+    elif total_updated > 0:
         print(f"Successfully applied {total_updated} predictions.")
     else:
         print("No new predictions to apply.")
 
 
+def add_apply_arguments(parser):
+    """Register the options of the apply command on a parser."""
+    parser.add_argument("--dry-run", action="store_true", help="Show changes without writing files")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Apply predictions to taxonomy files")
-    parser.add_argument("--dry-run", action="store_true", help="Show changes without writing files")
+    add_apply_arguments(parser)
     parser.set_defaults(func=cmd_apply)
     args = parser.parse_args()
     args.func(args)
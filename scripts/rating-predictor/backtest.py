@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Leave-one-out backtest: predict rated problems from merged_with_rating.json
+and compare against their contest ratings.
+
+Each held-out problem is searched against the reference store with itself
+excluded, then predicted with the same prompt, mode and model options as
+`predict`, except that the web-search plugin is off unless --web-search is
+given: the searched sites publish the contest ratings being predicted.
+Reports MAE/RMSE per difficulty tier plus latency, tokens and cost per item.
+Use --mock to run against a local mock endpoint.
+"""
+
+import argparse
+import math
+import os
+import random
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from core.utils import (
+    get_api_key,
+    iter_json_array,
+    build_embedding_text,
+    text_hash,
+    find_similar_batch,
+    write_json_atomic,
+    MERGED_RATING_PATH,
+    DEFAULT_PREDICT_MODEL,
+)
+from core.ann import load_similarity_index
+from core.store import load_references
+from core.compaction import PromptCompactor, DEFAULT_TOKEN_BUDGET
+from core.knn import DEFAULT_MAX_SPREAD, DEFAULT_MIN_SIMILARITY
+from core.ratelimit import RateLimiter
+from core.http_client import get_client
+from predict import embed_query_texts, local_estimate, build_slug_prompt, call_openrouter, is_valid_rating, needs_api_key
+
+TIERS = ("Easy", "Medium", "Hard")
+
+
+def select_items(n, seed=0, tier=None):
+    """Random sample of rated problems (all of them if n is None)."""
+    items = [p for p in iter_json_array(MERGED_RATING_PATH) if not tier or p.get('difficulty') == tier]
+    if n is not None and n < len(items):
+        items = random.Random(seed).sample(items, n)
+    return items
+
+
+def held_out_references(items, problems, vectors, model, index, api_key, k, concurrency):
+    """
+    Top-k references for every item, never including the item itself.
+
+    Items whose embedding text is unchanged in the store reuse their stored
+    vector; the rest are embedded like predict queries.
+
+    Returns:
+        List (one per item) of reference dicts with similarity scores
+    """
+    rows = {p['problem_slug']: i for i, p in enumerate(problems)}
+    texts = [build_embedding_text(item) for item in items]
+    stale = [
+        text for item, text in zip(items, texts)
+        if item['problem_slug'] not in rows or problems[rows[item['problem_slug']]].get('text_hash') != text_hash(text)
+    ]
+    embedded = embed_query_texts(api_key, stale, model, concurrency) if stale else {}
+
+    queries = np.asarray([
+        embedded[text] if text in embedded else vectors[rows[item['problem_slug']]]
+        for item, text in zip(items, texts)
+    ], dtype=np.float32)
+    return [
+        [ref for ref in refs if ref['problem_slug'] != item['problem_slug']][:k]
+        for item, refs in zip(items, find_similar_batch(queries, problems, index, k + 1))
+    ]
+
+
+def backtest_item(item, similar_problems, ctx):
+    """
+    Predict one held-out problem (worker thread).
+
+    Returns:
+        Result dict with the prediction, error, latency and usage
+    """
+    slug = item['problem_slug']
+    start = time.perf_counter()
+    record, usage, source = None, None, 'llm'
+    if ctx['mode'] != 'llm':
+        record = local_estimate(slug, item, similar_problems, ctx)
+        source = 'knn'
+    if record is None and ctx['mode'] != 'knn':
+        source = 'llm'
+        result, _ = call_openrouter(
+            ctx['api_key'], build_slug_prompt(slug, item, similar_problems, ctx), ctx['model'], limiter=ctx['limiter'],
+            web_search=ctx['web_search'],
+        )
+        if is_valid_rating(result):
+            record = {"predicted_rating": int(result["predicted_rating"])}
+            usage = result.get('_usage')
+    latency = time.perf_counter() - start
+
+    predicted = record["predicted_rating"] if record else None
+    return {
+        "slug": slug,
+        "difficulty": item.get('difficulty'),
+        "actual": item['Rating'],
+        "predicted": predicted,
+        "error": predicted - item['Rating'] if predicted is not None else None,
+        "source": source,
+        "latency": latency,
+        "prompt_tokens": (usage or {}).get('prompt_tokens', 0),
+        "completion_tokens": (usage or {}).get('completion_tokens', 0),
+        "cost": (usage or {}).get('cost', 0.0) or 0.0,
+    }
+
+
+def error_stats(results):
+    """(count, MAE, RMSE, mean signed error) over results with a prediction."""
+    errors = [r['error'] for r in results if r['error'] is not None]
+    if not errors:
+        return 0, None, None, None
+    n = len(errors)
+    return n, sum(abs(e) for e in errors) / n, math.sqrt(sum(e * e for e in errors) / n), sum(errors) / n
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))] if values else 0.0
+
+
+def print_report(results, elapsed, web_search=False):
+    """Print accuracy per tier and throughput/usage figures."""
+    print()
+    if web_search:
+        print("[!] Web search was on: the model may have looked up the held-out ratings, errors can be optimistic.")
+    else:
+        print("Web search: off (held-out ratings cannot be looked up)")
+    print(f"{'Tier':<8} {'n':>5} {'MAE':>8} {'RMSE':>8} {'Bias':>8}")
+    for tier in TIERS + ("All",):
+        subset = results if tier == "All" else [r for r in results if r['difficulty'] == tier]
+        n, mae, rmse, bias = error_stats(subset)
+        if n:
+            print(f"{tier:<8} {n:>5} {mae:>8.1f} {rmse:>8.1f} {bias:>+8.1f}")
+        elif tier != "All":
+            print(f"{tier:<8} {0:>5} {'-':>8} {'-':>8} {'-':>8}")
+
+    failures = sum(1 for r in results if r['predicted'] is None)
+    llm = [r for r in results if r['source'] == 'llm']
+    latencies = [r['latency'] for r in results]
+    print()
+    print(f"Items: {len(results)} ({failures} failed), {len(results) - len(llm)} answered by kNN, {len(llm)} by the LLM")
+    if latencies:
+        print(f"Latency per item: mean {sum(latencies) / len(latencies):.2f}s, "
+              f"p50 {percentile(latencies, 50):.2f}s, p95 {percentile(latencies, 95):.2f}s")
+    if elapsed > 0:
+        print(f"Throughput: {len(results) / elapsed:.2f} items/s ({elapsed:.1f}s total)")
+    if llm:
+        prompt_tokens = sum(r['prompt_tokens'] for r in llm)
+        completion_tokens = sum(r['completion_tokens'] for r in llm)
+        cost = sum(r['cost'] for r in results)
+        print(f"Tokens per LLM item: {prompt_tokens / len(llm):.0f} prompt, {completion_tokens / len(llm):.0f} completion")
+        print(f"Cost: ${cost / len(results):.6f} per item, ${cost:.4f} total")
+
+
+def cmd_backtest(args):
+    """Run the leave-one-out backtest."""
+    if args.no_similar and args.mode != 'llm':
+        print(f"[x] --mode {args.mode} needs similarity search; drop --no-similar.")
+        return
+
+    problems = model = None
+    if not args.no_similar:
+        problems, vectors, model = load_references()
+        if not problems:
+            print("[x] No reference embeddings. Run setup embeddings first, or pass --no-similar.")
+            return
+
+    items = select_items(None if args.all else args.n, args.seed, args.tier)
+    if not items:
+        print(f"[!] No rated problems to backtest{f' in tier {args.tier}' if args.tier else ''}.")
+        return
+
+    server = None
+    if args.mock:
+        from core.mock_llm import start_mock_server
+        server, args.api_base = start_mock_server(latency=args.mock_latency)
+        print(f"Using mock endpoint at {args.api_base}")
+    if args.api_base:
+        os.environ["OPENROUTER_API_BASE"] = args.api_base
+    api_key = None
+    if args.mock:
+        api_key = "mock"
+    elif needs_api_key(args.mode, model):
+        api_key = get_api_key()
+
+    print(f"Backtesting {len(items)} rated problems (mode {args.mode}, model {args.model}).")
+
+    similar = [None] * len(items)
+    if problems:
+        index = load_similarity_index(vectors, nprobe=args.nprobe, exact=args.exact)
+        similar = held_out_references(items, problems, vectors, model, index, api_key, args.neighbours, args.concurrency)
+
+    ctx = {
+        'api_key': api_key,
+        'model': args.model,
+        'limiter': RateLimiter(args.rate),
+        'compactor': None if args.no_compact else PromptCompactor(args.token_budget),
+        'mode': args.mode,
+        'max_spread': args.max_spread,
+        'min_similarity': args.min_similarity,
+        'web_search': args.web_search,
+    }
+
+    results = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        futures = [pool.submit(backtest_item, item, refs, ctx) for item, refs in zip(items, similar)]
+        for done, future in enumerate(as_completed(futures), 1):
+            results.append(future.result())
+            if done % 25 == 0 or done == len(futures):
+                print(f"  [*] {done}/{len(futures)} items")
+    elapsed = time.perf_counter() - start
+
+    print_report(results, elapsed, args.web_search)
+    if ctx['compactor'] is not None:
+        ctx['compactor'].print_report()
+    get_client().print_stats()
+
+    if args.output:
+        settings = {k: getattr(args, k) for k in ('n', 'seed', 'tier', 'model', 'mode', 'max_spread', 'min_similarity', 'neighbours', 'no_similar', 'no_compact', 'token_budget', 'web_search')}
+        write_json_atomic(Path(args.output), {"settings": settings, "elapsed": elapsed, "results": results}, indent=2)
+        print(f"Saved per-item results to: {args.output}")
+    if server is not None:
+        server.shutdown()
+
+
+def add_backtest_arguments(parser):
+    """Register the options of the backtest command on a parser."""
+    parser.add_argument("-n", type=int, default=50, help="Number of rated problems to hold out (default: 50)")
+    parser.add_argument("--all", action="store_true", help="Hold out every rated problem")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed (default: 0)")
+    parser.add_argument("--tier", choices=TIERS, help="Only problems of this difficulty")
+    parser.add_argument("--model", type=str, default=DEFAULT_PREDICT_MODEL, help=f"OpenRouter model (default: {DEFAULT_PREDICT_MODEL})")
+    parser.add_argument("--mode", choices=["llm", "knn", "cascade"], default="llm", help="Prediction mode, as for predict (default: llm)")
+    parser.add_argument("--max-spread", type=float, default=DEFAULT_MAX_SPREAD, help=f"Cascade spread threshold (default: {DEFAULT_MAX_SPREAD:g})")
+    parser.add_argument("--min-similarity", type=float, default=DEFAULT_MIN_SIMILARITY, help=f"Cascade similarity threshold (default: {DEFAULT_MIN_SIMILARITY:g})")
+    parser.add_argument("--neighbours", type=int, default=5, help="Reference problems per item (default: 5)")
+    parser.add_argument("--no-similar", action="store_true", help="Predict without reference problems")
+    parser.add_argument("--exact", action="store_true", help="Use exact similarity search even if an ANN index exists")
+    parser.add_argument("--nprobe", type=int, help="IVF lists probed per query")
+    parser.add_argument("--no-compact", action="store_true", help="Send raw prompts (no compaction)")
+    parser.add_argument("--web-search", action="store_true", help="Enable the web-search plugin as predict does (leaks the held-out ratings)")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET, help=f"Estimated token budget per prompt (default: {DEFAULT_TOKEN_BUDGET})")
+    parser.add_argument("--concurrency", type=int, default=4, help="Items predicted in parallel (default: 4)")
+    parser.add_argument("--rate", type=float, default=5.0, help="Maximum chat requests per second (default: 5)")
+    parser.add_argument("--api-base", type=str, help="OpenRouter-compatible API base URL (default: $OPENROUTER_API_BASE or openrouter.ai)")
+    parser.add_argument("--mock", action="store_true", help="Start a local mock endpoint and run against it (no API key needed)")
+    parser.add_argument("--mock-latency", type=float, default=0.0, help="Seconds the mock waits per request (default: 0)")
+    parser.add_argument("--output", type=str, help="Write per-item results to this JSON file")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leave-one-out backtest over merged_with_rating.json")
+    add_backtest_arguments(parser)
+    parser.set_defaults(func=cmd_backtest)
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
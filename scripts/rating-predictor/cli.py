@@ -5,21 +5,59 @@ Rating Predictor CLI - Unified tool for predicting LeetCode problem ratings.
 Usage:
     python cli.py setup join          # Join zerotrac with merged_problems
     python cli.py setup embeddings     # Generate embeddings
+    python cli.py setup embeddings --embedder local  # Offline hashed TF-IDF embeddings (no API calls)
+    python cli.py setup convert        # Convert legacy JSON embeddings to the binary store
+    python cli.py setup db             # Create/refresh the optional SQLite dataset
     python cli.py predict --all         # Predict all remaining problems
     python cli.py predict --slug two-sum  # Predict specific problem
+    python cli.py predict prepare --all  # Precompute the neighbour table for pending slugs
     python cli.py list                 # List all predictions
+    python cli.py list --model X --below 1600  # Filtered listing
+    python cli.py compact              # Fold the predictions journal into predictions.json
     python cli.py apply                # Apply predictions to taxonomy files
+    python cli.py extract              # Re-extract changed raw pages into the taxonomy graph
+    python cli.py extract --full       # Rebuild the whole taxonomy graph from the raw pages
+    python cli.py backtest -n 100      # Leave-one-out accuracy/latency/cost backtest
+    python cli.py backtest --mock      # Same against a local mock endpoint (no API key)
 """
 
 import argparse
+import importlib
+import sys
 from pathlib import Path
 
-# Import subcommands
-from core.utils import PREDICTIONS_PATH, EMBEDDINGS_PATH, MERGED_RATING_PATH
+from core.utils import (
+    PREDICTIONS_PATH,
+    PREDICTIONS_JOURNAL_PATH,
+    EMBEDDINGS_PATH,
+    EMBEDDINGS_META_PATH,
+    MERGED_RATING_PATH,
+    DATASET_DB_PATH,
+    read_count_sidecar,
+)
+
+# Subcommands: name -> (module, command function, argument registrar, help).
+# Modules are imported only for the subcommand actually invoked, so e.g.
+# `status` and `list` never load requests, numpy or the search stack.
+COMMANDS = {
+    'predict': ('predict', 'cmd_predict', 'add_predict_arguments', 'Generate predictions'),
+    'list': ('predictions', 'cmd_list', 'add_list_arguments', 'List all predictions'),
+    'compact': ('predictions', 'cmd_compact', None, 'Fold the predictions journal into predictions.json'),
+    'apply': ('apply', 'cmd_apply', 'add_apply_arguments', 'Apply predictions to taxonomy files'),
+    'extract': ('extract', 'cmd_extract', 'add_extract_arguments', 'Rebuild the taxonomy graph from the raw pages'),
+    'backtest': ('backtest', 'cmd_backtest', 'add_backtest_arguments', 'Leave-one-out backtest over rated problems'),
+}
+
+SETUP_COMMANDS = {
+    'join': ('setup', 'cmd_join', None, 'Join zerotrac with merged_problems'),
+    'embeddings': ('setup', 'cmd_embeddings', 'add_embedding_arguments', 'Generate embeddings'),
+    'convert': ('setup', 'cmd_convert', None, 'Convert legacy JSON embeddings to the binary store'),
+    'db': ('setup', 'cmd_db', None, 'Create or refresh the optional SQLite dataset'),
+}
 
 
 def cmd_status(args):
-    """Show status of data files."""
+    """Show status of data files (read from headers and sidecars only)."""
     print("Rating Predictor Status")
     print("=" * 40)
     print()
@@ -36,25 +74,61 @@ def cmd_status(args):
     # Check data files
     print("Data Files:")
     print(f"  Predictions: {'✓' if PREDICTIONS_PATH.exists() else '✗'} {PREDICTIONS_PATH.name}")
-    if PREDICTIONS_PATH.exists():
-        import json
-        with open(PREDICTIONS_PATH, 'r') as f:
-            pred = json.load(f)
-        print(f"    Count: {len(pred)} predictions")
+    counts = None
+    if DATASET_DB_PATH.exists():
+        from core.dataset import Dataset
+        counts = Dataset().counts()
+        print(f"    Count: {counts['predictions']} predictions")
+    elif PREDICTIONS_PATH.exists() or PREDICTIONS_JOURNAL_PATH.exists():
+        count = read_count_sidecar(PREDICTIONS_PATH) if PREDICTIONS_PATH.exists() else 0
+        if count is None:
+            from core.utils import load_predictions
+            print(f"    Count: {len(load_predictions())} predictions")
+        else:
+            pending = 0
+            if PREDICTIONS_JOURNAL_PATH.exists():
+                with open(PREDICTIONS_JOURNAL_PATH, 'rb') as f:
+                    pending = sum(1 for _ in f)
+            print(f"    Count: {count} predictions" + (f" (+{pending} uncompacted journal entries)" if pending else ""))
 
     print(f"  Embeddings: {'✓' if EMBEDDINGS_PATH.exists() else '✗'} {EMBEDDINGS_PATH.name}")
-    if EMBEDDINGS_PATH.exists():
+    if EMBEDDINGS_META_PATH.exists():
         import json
-        with open(EMBEDDINGS_PATH, 'r') as f:
-            emb = json.load(f)
-        print(f"    Count: {emb.get('count', 0)} problems")
+        with open(EMBEDDINGS_META_PATH, 'r') as f:
+            header = json.loads(f.readline())
+        print(f"    Count: {header.get('count', 0)} problems ({header.get('model')}, dim {header.get('dim')})")
 
     print(f"  Merged Rating: {'✓' if MERGED_RATING_PATH.exists() else '✗'} {MERGED_RATING_PATH.name}")
     if MERGED_RATING_PATH.exists():
-        import json
-        with open(MERGED_RATING_PATH, 'r') as f:
-            mr = json.load(f)
-        print(f"    Count: {len(mr)} problems")
+        count = read_count_sidecar(MERGED_RATING_PATH)
+        if count is None:
+            # No sidecar yet (join predates it): stream instead of loading the file
+            from core.utils import iter_json_array
+            count = sum(1 for _ in iter_json_array(MERGED_RATING_PATH))
+        print(f"    Count: {count} problems")
+
+    print(f"  Dataset: {'✓' if DATASET_DB_PATH.exists() else '✗'} {DATASET_DB_PATH.name} (optional)")
+    if counts is not None:
+        print(f"    " + ", ".join(f"{table}: {count}" for table, count in counts.items()))
+
+
+def lazy_command(module, func):
+    """Command callback that imports its module on first use."""
+    def run(args):
+        return getattr(importlib.import_module(module), func)(args)
+    return run
+
+
+def register(subparsers, commands, selected):
+    """
+    Add a subparser per command; only the selected one gets its arguments,
+    which requires importing its module.
+    """
+    for name, (module, func, add_arguments, help_text) in commands.items():
+        sub = subparsers.add_parser(name, help=help_text)
+        if name == selected and add_arguments:
+            getattr(importlib.import_module(module), add_arguments)(sub)
+        sub.set_defaults(func=lazy_command(module, func))
 
 
 def main():
@@ -65,43 +139,22 @@ def main():
     )
     subparsers = parser.add_subparsers(dest='command', help='Command to run')
 
+    # The first two positionals name the (sub)command being run
+    positionals = [arg for arg in sys.argv[1:] if not arg.startswith('-')]
+    command = positionals[0] if positionals else None
+    setup_command = positionals[1] if len(positionals) > 1 and command == 'setup' else None
+
     # status command
     status_parser = subparsers.add_parser('status', help='Show status of data files')
     status_parser.set_defaults(func=cmd_status)
 
     # Setup subcommands
-    setup_parser = subparsers.add_parser('setup', help='Setup commands (join, embeddings)')
+    setup_parser = subparsers.add_parser('setup', help='Setup commands (join, embeddings, convert, db)')
     setup_subparsers = setup_parser.add_subparsers(dest='setup_cmd')
+    register(setup_subparsers, SETUP_COMMANDS, setup_command)
 
-    setup_join_parser = setup_subparsers.add_parser('join', help='Join zerotrac with merged_problems')
-    from setup import cmd_join as setup_cmd_join
-    setup_join_parser.set_defaults(func=lambda args: setup_cmd_join(args))
-
-    setup_emb_parser = setup_subparsers.add_parser('embeddings', help='Generate embeddings')
-    from setup import cmd_embeddings as setup_cmd_embeddings
-    setup_emb_parser.set_defaults(func=lambda args: setup_cmd_embeddings(args))
-
-    # Predict subcommands
-    predict_parser = subparsers.add_parser('predict', help='Generate predictions')
-    from predict import cmd_predict as predict_cmd
-    predict_parser.add_argument("--all", action="store_true", help="Run predictions on all remaining problems")
-    predict_parser.add_argument("-k", type=int, default=1, help="Number of predictions to run (default: 1)")
-    predict_parser.add_argument("--model", type=str, help="OpenRouter model to use")
-    predict_parser.add_argument("--force", action="store_true", help="Regenerate all predictions")
-    predict_parser.add_argument("--no-similar", action="store_true", help="Disable similarity-based reference context")
-    predict_parser.add_argument("--slug", type=str, help="Predict for a specific problem slug")
-    predict_parser.set_defaults(func=lambda args: predict_cmd(args))
-
-    # List subcommands
-    list_parser = subparsers.add_parser('list', help='List all predictions')
-    from predict import cmd_list as predict_cmd_list
-    list_parser.set_defaults(func=lambda args: predict_cmd_list(args))
-
-    # Apply command
-    apply_parser = subparsers.add_parser('apply', help='Apply predictions to taxonomy files')
-    from apply import cmd_apply as apply_cmd
-    apply_parser.add_argument("--dry-run", action="store_true", help="Show changes without writing files")
-    apply_parser.set_defaults(func=lambda args: apply_cmd(args))
+    # predict, list, compact, apply, extract and backtest
+    register(subparsers, COMMANDS, command)
 
     args = parser.parse_args()
     if hasattr(args, 'func'):
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Approximate nearest-neighbour search: an inverted-file (IVF) index over
+spherical k-means centroids, in pure NumPy.
+
+The reference vectors are partitioned into n_lists clusters. A query is only
+scored against the members of its nprobe closest clusters, so cost grows
+with nprobe / n_lists of the corpus instead of all of it; raising nprobe
+trades speed for recall.
+"""
+
+import time
+import numpy as np
+from core.similarity import SimilarityIndex, normalize_rows, top_k
+from core.store import store_fingerprint
+from core.utils import ANN_INDEX_PATH, EMBEDDINGS_META_PATH
+
+# Recall target used to pick the default nprobe when building
+TARGET_RECALL = 0.95
+
+
+def spherical_kmeans(matrix, n_lists, iterations=20, seed=0, batch_size=16384):
+    """
+    Cluster unit vectors by cosine similarity.
+
+    Returns:
+        (centroids, assignments): (n_lists, dim) unit centroids and the
+        cluster id of every row
+    """
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    centroids = np.array(matrix[rng.choice(n, size=n_lists, replace=False)], dtype=np.float32)
+    assignments = np.zeros(n, dtype=np.int64)
+
+    for _ in range(iterations):
+        for start in range(0, n, batch_size):
+            chunk = np.asarray(matrix[start:start + batch_size])
+            assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+
+        sums = np.zeros_like(centroids)
+        for start in range(0, n, batch_size):
+            chunk = np.asarray(matrix[start:start + batch_size])
+            one_hot = np.zeros((len(chunk), n_lists), dtype=np.float32)
+            one_hot[np.arange(len(chunk)), assignments[start:start + len(chunk)]] = 1.0
+            sums += one_hot.T @ chunk
+        counts = np.bincount(assignments, minlength=n_lists)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters with random rows
+            sums[empty] = matrix[rng.choice(n, size=int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+
+    return centroids, assignments
+
+
+class IVFIndex(SimilarityIndex):
+    """
+    Inverted-file index with the same search interface as SimilarityIndex.
+
+    Lists are stored CSR-style: the ids of list i are
+    list_ids[list_offsets[i]:list_offsets[i + 1]].
+    """
+
+    def __init__(self, embeddings, centroids, list_offsets, list_ids, nprobe=8, normalized=True):
+        super().__init__(embeddings, normalized=normalized)
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.nprobe = nprobe
+
+    @property
+    def n_lists(self):
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(cls, embeddings, n_lists=None, iterations=20, seed=0, normalized=True):
+        """Cluster the references and build the inverted lists (n_lists defaults to ~sqrt(N))."""
+        matrix = np.asarray(embeddings, dtype=np.float32) if normalized else normalize_rows(embeddings)
+        n = matrix.shape[0]
+        n_lists = min(n, n_lists or max(1, int(round(np.sqrt(n)))))
+        centroids, assignments = spherical_kmeans(matrix, n_lists, iterations=iterations, seed=seed)
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=n_lists)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(matrix, centroids, list_offsets, order.astype(np.int64), normalized=True)
+
+    def search_batch(self, queries, k=5, nprobe=None):
+        queries = normalize_rows(queries)
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match index dimension {self.dim}")
+        nprobe = min(self.n_lists, nprobe or self.nprobe)
+
+        probe_lists, _ = top_k(queries @ self.centroids.T, nprobe)
+        all_indices = np.full((len(queries), k), -1, dtype=np.int64)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, lists in enumerate(probe_lists):
+            candidates = np.concatenate([
+                self.list_ids[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists
+            ])
+            if len(candidates) == 0:
+                continue
+            scores = (self.matrix[candidates] @ queries[q])[np.newaxis, :]
+            local, best = top_k(scores, k)
+            found = local.shape[1]
+            all_indices[q, :found] = candidates[local[0]]
+            all_scores[q, :found] = best[0]
+        return all_indices, all_scores
+
+    def save(self, path=ANN_INDEX_PATH, fingerprint=''):
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                list_offsets=self.list_offsets,
+                list_ids=self.list_ids,
+                nprobe=np.int64(self.nprobe),
+                fingerprint=np.str_(fingerprint),
+            )
+
+    @classmethod
+    def load(cls, embeddings, path=ANN_INDEX_PATH, fingerprint=None):
+        """
+        Load a saved index over the given (normalized) embeddings.
+
+        Returns None if the file is missing or was built from a different store.
+        """
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            if fingerprint is not None and str(data['fingerprint']) != fingerprint:
+                return None
+            return cls(
+                embeddings,
+                data['centroids'],
+                data['list_offsets'],
+                data['list_ids'],
+                nprobe=int(data['nprobe']),
+            )
+
+
+def recall_report(index, sample=200, k=5, nprobes=(1, 2, 4, 8, 16, 32), seed=0):
+    """
+    Measure recall@k of an IVFIndex against the exact scan.
+
+    Sampled reference rows are used as queries; each query's own row is
+    excluded from both result lists.
+
+    Returns:
+        List of (nprobe, recall, avg query latency in ms)
+    """
+    rng = np.random.default_rng(seed)
+    n = len(index)
+    rows = rng.choice(n, size=min(sample, n), replace=False)
+    queries = np.asarray(index.matrix[rows])
+
+    exact_indices, _ = top_k(queries @ index.matrix.T, k + 1)
+    exact = [set(r[r != row][:k]) for r, row in zip(exact_indices, rows)]
+
+    report = []
+    for nprobe in nprobes:
+        if nprobe > index.n_lists:
+            break
+        start = time.perf_counter()
+        approx_indices, _ = index.search_batch(queries, k + 1, nprobe=nprobe)
+        latency = (time.perf_counter() - start) / len(rows) * 1000
+        hits = sum(len(e & set(a[a != row][:k])) for e, a, row in zip(exact, approx_indices, rows))
+        report.append((nprobe, hits / (len(rows) * k), latency))
+    return report
+
+
+def choose_nprobe(report, target=TARGET_RECALL):
+    """Smallest nprobe whose recall reaches target (else the best measured)."""
+    for nprobe, recall, _ in report:
+        if recall >= target:
+            return nprobe
+    return max(report, key=lambda r: r[1])[0]
+
+
+def load_similarity_index(embeddings, nprobe=None, exact=False):
+    """
+    Pick the search backend for the reference embeddings.
+
+    Uses the persisted IVF index when one exists for the current store (and
+    exact is not requested), otherwise the exact SimilarityIndex.
+    """
+    if not exact and ANN_INDEX_PATH.exists() and EMBEDDINGS_META_PATH.exists():
+        index = IVFIndex.load(embeddings, fingerprint=store_fingerprint())
+        if index is not None:
+            if nprobe:
+                index.nprobe = nprobe
+            return index
+        print(f"  [!] {ANN_INDEX_PATH.name} is stale, using exact search (re-run setup embeddings --ann ivf).")
+    return SimilarityIndex(embeddings, normalized=True)
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk caches backed by SQLite.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import numpy as np
+from core.utils import EMBEDDING_CACHE_PATH, META_CACHE_PATH, RESPONSE_CACHE_PATH, COMPACT_CACHE_PATH, text_hash
+
+# Default size bound for the embedding cache (4096-dim float32 ~ 16 KB per entry)
+EMBEDDING_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Default size bound for the LLM response cache
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Metadata cache lifetimes: found problems rarely change, failures may be transient
+META_CACHE_TTL = 30 * 24 * 3600
+META_CACHE_NEGATIVE_TTL = 24 * 3600
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by (model, sha256 of text).
+
+    Shared by setup embeddings and the per-slug query path. Entries are
+    evicted least-recently-used first once the total size exceeds max_bytes.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_bytes=EMBEDDING_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, model, texts):
+        """
+        Bulk lookup.
+
+        Returns:
+            Dict mapping text -> float32 vector for every cached text
+        """
+        hashes = {}
+        for text in texts:
+            hashes.setdefault(text_hash(text), []).append(text)
+        found = {}
+        keys = list(hashes)
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+                    [model, *chunk],
+                ).fetchall()
+                for h, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    for text in hashes[h]:
+                        found[text] = vector
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(time.time(), model, h) for h, _ in rows],
+                )
+            self._conn.commit()
+        return found
+
+    def get(self, model, text):
+        """Look up a single text (None on miss)."""
+        return self.get_many(model, [text]).get(text)
+
+    def put_many(self, model, texts, vectors):
+        """Store embeddings for texts (same order as vectors)."""
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            vector = np.asarray(vector, dtype=np.float32)
+            rows.append((model, text_hash(text), int(vector.shape[0]), vector.tobytes(), now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def put(self, model, text, vector):
+        """Store a single embedding."""
+        self.put_many(model, [text], [vector])
+
+    def size_bytes(self):
+        """Total size of all cached vectors."""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def evict(self, max_bytes=None):
+        """
+        Drop least-recently-used entries until the cache fits in max_bytes.
+
+        Returns:
+            Number of evicted entries
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        total = self.size_bytes()
+        if total <= max_bytes:
+            return 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used ASC"
+            ).fetchall()
+            doomed = []
+            for rowid, size in rows:
+                if total <= max_bytes:
+                    break
+                doomed.append((rowid,))
+                total -= size
+            self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", doomed)
+            self._conn.commit()
+        return len(doomed)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MetaCache:
+    """
+    Problem metadata fetched from the third-party LeetCode APIs, keyed by slug.
+
+    Definitive misses are cached too (negative caching, with a shorter TTL),
+    so a slug no API knows about is not re-fetched on every run.
+    """
+
+    def __init__(self, path=META_CACHE_PATH, ttl=META_CACHE_TTL, negative_ttl=META_CACHE_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS problem_meta (
+                slug TEXT PRIMARY KEY,
+                meta TEXT,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, slug):
+        """
+        Look up a slug.
+
+        Returns:
+            (hit, meta): hit is False when the slug is unknown or expired;
+            meta is None for a cached miss
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT meta, fetched_at FROM problem_meta WHERE slug = ?", (slug,)
+            ).fetchone()
+        if row is None:
+            return False, None
+        meta, fetched_at = row
+        ttl = self.ttl if meta is not None else self.negative_ttl
+        if time.time() - fetched_at > ttl:
+            return False, None
+        return True, json.loads(meta) if meta is not None else None
+
+    def put(self, slug, meta):
+        """Store fetched metadata (None records a slug no API knows about)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO problem_meta (slug, meta, fetched_at) VALUES (?, ?, ?)",
+                (slug, json.dumps(meta) if meta is not None else None, time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Parsed LLM responses keyed by a hash of everything that shapes the answer
+    (model, temperature, system and user prompt hashes, plugin config).
+
+    Re-running an identical request returns the stored answer instead of
+    calling the API again. Entries are evicted least-recently-used first once
+    the total size exceeds max_bytes.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(model, temperature, system_prompt, user_prompt, plugins):
+        """Cache key for one request."""
+        return text_hash(json.dumps([
+            model,
+            temperature,
+            text_hash(system_prompt),
+            text_hash(user_prompt),
+            plugins,
+        ], sort_keys=True))
+
+    def get(self, key):
+        """Look up a response (None on miss)."""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, model, response):
+        """Store a parsed response."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, last_used) VALUES (?, ?, ?, ?)",
+                (key, model, json.dumps(response, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+
+    def invalidate(self, model=None):
+        """
+        Drop cached responses (only those of one model if given).
+
+        Returns:
+            Number of deleted entries
+        """
+        with self._lock:
+            if model:
+                cur = self._conn.execute("DELETE FROM responses WHERE model = ?", (model,))
+            else:
+                cur = self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+        return cur.rowcount
+
+    def evict(self, max_bytes=None):
+        """
+        Drop least-recently-used entries until the cache fits in max_bytes.
+
+        Returns:
+            Number of evicted entries
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rowid, LENGTH(key) + LENGTH(response) FROM responses ORDER BY last_used DESC"
+            ).fetchall()
+            total = sum(size for _, size in rows)
+            doomed = []
+            while rows and total > max_bytes:
+                rowid, size = rows.pop()
+                doomed.append((rowid,))
+                total -= size
+            self._conn.executemany("DELETE FROM responses WHERE rowid = ?", doomed)
+            self._conn.commit()
+        return len(doomed)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CompactCache:
+    """
+    Compacted problem text fields, keyed by slug.
+
+    Each entry records a hash of the source metadata it was derived from; an
+    entry whose source has changed is treated as a miss.
+    """
+
+    def __init__(self, path=COMPACT_CACHE_PATH):
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS compacted (
+                slug TEXT PRIMARY KEY,
+                source_hash TEXT NOT NULL,
+                meta TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def _source_hash(meta):
+        return text_hash(json.dumps(meta, sort_keys=True, ensure_ascii=False, default=str))
+
+    def get(self, slug, meta):
+        """Compacted fields for slug if cached from the same source meta (None otherwise)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT source_hash, meta FROM compacted WHERE slug = ?", (slug,)
+            ).fetchone()
+        if row is None or row[0] != self._source_hash(meta):
+            return None
+        return json.loads(row[1])
+
+    def put(self, slug, meta, compacted):
+        """Store the compacted fields derived from meta."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO compacted (slug, source_hash, meta) VALUES (?, ?, ?)",
+                (slug, self._source_hash(meta), json.dumps(compacted, ensure_ascii=False)),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Prompt compaction: HTML-to-text, constraint de-duplication and a token budget.
+
+Problem descriptions arrive as raw HTML, and the parsed constraints usually
+repeat the constraints already listed at the bottom of the description. The
+compactor turns each problem's text fields into clean text once (cached per
+slug), then trims the assembled user prompt to a token budget, cutting the
+least useful parts first: the solution excerpt, then hints, then the tail
+of the description.
+"""
+
+import re
+import threading
+from html.parser import HTMLParser
+from core.prompts import build_user_prompt
+
+DEFAULT_TOKEN_BUDGET = 1500
+
+# Rough token estimator: ~4 characters per token for English text and code
+CHARS_PER_TOKEN = 4
+
+BLOCK_TAGS = {'p', 'div', 'br', 'pre', 'ul', 'ol', 'li', 'tr', 'table', 'blockquote',
+              'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+
+
+def estimate_tokens(text):
+    """Estimated token count of a text."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class _TextExtractor(HTMLParser):
+    """Collect the text of an HTML fragment, keeping list and paragraph structure."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'li':
+            self.parts.append('\n- ')
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+        elif tag == 'sup':
+            # 10<sup>5</sup> -> 10^5
+            self.parts.append('^')
+        elif tag == 'img':
+            alt = dict(attrs).get('alt')
+            if alt:
+                self.parts.append(f'[{alt}]')
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS and tag != 'li':
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def html_to_text(html):
+    """Convert an HTML fragment (or plain text) to compact plain text."""
+    if not html:
+        return ''
+    if not isinstance(html, str):
+        html = str(html)
+    if '<' in html or '&' in html:
+        parser = _TextExtractor()
+        parser.feed(html)
+        parser.close()
+        html = ''.join(parser.parts)
+    lines = (re.sub(r'[ \t\xa0]+', ' ', line).strip() for line in html.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def _normalized(text):
+    """Comparison form of a constraint: no whitespace, lower case, ASCII comparisons."""
+    text = text.replace('≤', '<=').replace('≥', '>=').replace('−', '-')
+    return re.sub(r'\s+', '', text).lower()
+
+
+def _as_list(value):
+    if not value:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def compact_fields(meta):
+    """
+    Clean the text fields of one problem.
+
+    Returns:
+        Copy of meta with description, constraints, hints and solution as
+        plain text; constraints already present in the description are dropped
+    """
+    description = html_to_text(meta.get('description'))
+    in_description = _normalized(description)
+
+    constraints, seen = [], set()
+    for constraint in _as_list(meta.get('constraints')):
+        text = html_to_text(constraint)
+        key = _normalized(text)
+        if text and key not in seen and key not in in_description:
+            seen.add(key)
+            constraints.append(text)
+
+    hints = list(dict.fromkeys(h for h in (html_to_text(h) for h in _as_list(meta.get('hints'))) if h))
+
+    compacted = dict(meta)
+    compacted.update({
+        "description": description,
+        "constraints": constraints,
+        "hints": hints,
+        "solution": html_to_text(meta.get('solution')),
+    })
+    return compacted
+
+
+def fit_budget(meta, similar_problems, budget):
+    """
+    Build the user prompt, trimming compacted fields until it fits the budget.
+
+    Returns:
+        The user prompt (may still exceed the budget if the fixed parts do)
+    """
+    prompt = build_user_prompt(meta, similar_problems)
+    if estimate_tokens(prompt) <= budget:
+        return prompt
+
+    meta = dict(meta)
+
+    def over():
+        return (estimate_tokens(build_user_prompt(meta, similar_problems)) - budget) * CHARS_PER_TOKEN
+
+    # Solution excerpt first (build_user_prompt shows at most 1000 chars)
+    solution = meta['solution'][:1000]
+    keep = len(solution) - over()
+    meta['solution'] = solution[:keep] if keep >= 200 else ''
+
+    # Then hints, last one first
+    while meta['hints'] and over() > 0:
+        meta['hints'] = meta['hints'][:-1]
+
+    # Finally the tail of the description, cut at a word boundary
+    excess = over()
+    if excess > 0:
+        description = meta['description']
+        cut = max(0, len(description) - excess - 3)
+        meta['description'] = description[:cut].rsplit(' ', 1)[0] + '...' if cut else ''
+
+    return build_user_prompt(meta, similar_problems)
+
+
+class PromptCompactor:
+    """
+    Compacts user prompts and keeps a running before/after token tally.
+
+    Cleaned fields are cached per slug (see CompactCache); safe to share
+    between worker threads.
+    """
+
+    def __init__(self, budget=DEFAULT_TOKEN_BUDGET, cache=None):
+        self.budget = budget
+        self.cache = cache
+        self.prompts = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self._lock = threading.Lock()
+
+    def build_prompt(self, slug, meta, similar_problems=None):
+        """Compacted equivalent of build_user_prompt(meta, similar_problems)."""
+        compacted = self.cache.get(slug, meta) if self.cache is not None else None
+        if compacted is None:
+            compacted = compact_fields(meta)
+            if self.cache is not None:
+                self.cache.put(slug, meta, compacted)
+
+        prompt = fit_budget(compacted, similar_problems, self.budget)
+        before = estimate_tokens(build_user_prompt(meta, similar_problems))
+        with self._lock:
+            self.prompts += 1
+            self.tokens_before += before
+            self.tokens_after += estimate_tokens(prompt)
+        return prompt
+
+    def print_report(self):
+        """Print the before/after token counts of this run."""
+        if not self.prompts:
+            return
+        saved = self.tokens_before - self.tokens_after
+        percent = 100 * saved / self.tokens_before if self.tokens_before else 0.0
+        print(f"Prompt compaction: {self.prompts} prompts, ~{self.tokens_before} -> ~{self.tokens_after} "
+              f"tokens (saved ~{saved}, {percent:.0f}%, budget {self.budget}/prompt)")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Optional unified SQLite dataset (WAL mode) for references, embeddings,
+predictions and fetch caches.
+
+The JSON/binary files stay the source of truth; once data/dataset.sqlite has
+been created with `cli.py setup db`, predict also writes every new prediction
+and metadata fetch into it, predict and backtest read their references from
+it, and status/list answer from indexed queries instead of loading whole
+files. WAL mode lets several processes read and
+write the database at the same time.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from core.utils import DATASET_DB_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS refs (
+    slug TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    difficulty TEXT,
+    rating REAL NOT NULL,
+    topics TEXT NOT NULL,
+    text_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS refs_rating ON refs (rating);
+
+CREATE TABLE IF NOT EXISTS embeddings (
+    slug TEXT PRIMARY KEY REFERENCES refs (slug) ON DELETE CASCADE,
+    model TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS predictions (
+    slug TEXT PRIMARY KEY,
+    predicted_rating INTEGER NOT NULL,
+    rationale TEXT,
+    annotator TEXT,
+    created_at REAL
+);
+CREATE INDEX IF NOT EXISTS predictions_annotator ON predictions (annotator, predicted_rating);
+CREATE INDEX IF NOT EXISTS predictions_rating ON predictions (predicted_rating);
+
+CREATE TABLE IF NOT EXISTS problem_meta (
+    slug TEXT PRIMARY KEY,
+    meta TEXT,
+    fetched_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS info (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def dataset_enabled(path=DATASET_DB_PATH):
+    """The SQLite backend is opt-in: it is used once the database file exists."""
+    return path.exists()
+
+
+def connect(path=DATASET_DB_PATH):
+    """Open a connection configured for concurrent multi-process access."""
+    conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+class Dataset:
+    """Thin query layer over the dataset database."""
+
+    def __init__(self, path=DATASET_DB_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- writes ---
+
+    def upsert_predictions(self, items, created_at=None):
+        """Insert or replace predictions from (slug, record) pairs."""
+        now = time.time() if created_at is None else created_at
+        rows = [
+            (slug, rec['predicted_rating'], rec.get('rationale', ''), rec.get('annotator'), rec.get('created_at', now))
+            for slug, rec in items
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO predictions (slug, predicted_rating, rationale, annotator, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def upsert_prediction(self, slug, record):
+        """Insert or replace a single prediction."""
+        self.upsert_predictions([(slug, record)])
+
+    def replace_references(self, problems, vectors, model, store=None):
+        """
+        Replace the reference set and its embeddings in one transaction.
+
+        Args:
+            problems: Reference problem dicts (same order as vectors)
+            vectors: (count, dim) array-like of embeddings
+            model: Embedding model name
+            store: Fingerprint of the binary store the references were written to
+        """
+        from core.similarity import normalize_rows  # lazy: status and list only need the prediction queries
+        with self._lock:
+            self._conn.execute("DELETE FROM refs")
+            self._conn.executemany(
+                "INSERT INTO refs (slug, title, difficulty, rating, topics, text_hash) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (p['problem_slug'], p['title'], p.get('difficulty'), p['Rating'],
+                     json.dumps(p.get('topics', [])), p.get('text_hash'))
+                    for p in problems
+                ],
+            )
+            self._conn.executemany(
+                "INSERT INTO embeddings (slug, model, dim, vector) VALUES (?, ?, ?, ?)",
+                [
+                    (p['problem_slug'], model, int(v.shape[0]), v.tobytes())
+                    for p, v in zip(problems, normalize_rows(vectors))
+                ],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)",
+                [('model', model), ('store', store)],
+            )
+            self._conn.commit()
+
+    # --- reads ---
+
+    def counts(self):
+        """Row counts per table."""
+        with self._lock:
+            return {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('refs', 'embeddings', 'predictions', 'problem_meta')
+            }
+
+    def query_predictions(self, model=None, below=None, above=None):
+        """
+        Filtered prediction lookup, e.g. all predictions by model X below rating Y.
+
+        Returns:
+            List of (slug, record) sorted by slug
+        """
+        clauses, params = [], []
+        if model:
+            clauses.append("annotator = ?")
+            params.append(model)
+        if below is not None:
+            clauses.append("predicted_rating < ?")
+            params.append(below)
+        if above is not None:
+            clauses.append("predicted_rating > ?")
+            params.append(above)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT slug, predicted_rating, rationale, annotator, created_at FROM predictions {where} ORDER BY slug",
+                params,
+            ).fetchall()
+        return [
+            (slug, {"predicted_rating": rating, "rationale": rationale, "annotator": annotator, "created_at": created_at})
+            for slug, rating, rationale, annotator, created_at in rows
+        ]
+
+    def load_references(self, store=None):
+        """
+        Load references with their embeddings, in the order they were written.
+
+        Args:
+            store: Fingerprint of the current binary store; references written
+                from another store are not returned
+
+        Returns:
+            (problems, vectors, model) with vectors as a (count, dim) float32
+            matrix, or (None, None, None) if there are no matching references
+        """
+        import numpy as np
+        with self._lock:
+            info = dict(self._conn.execute("SELECT key, value FROM info").fetchall())
+            if store is not None and info.get('store') != store:
+                return None, None, None
+            rows = self._conn.execute(
+                "SELECT r.slug, r.title, r.difficulty, r.rating, r.topics, r.text_hash, e.vector "
+                "FROM refs r JOIN embeddings e ON e.slug = r.slug WHERE e.model = ? ORDER BY r.rowid",
+                (info.get('model'),),
+            ).fetchall()
+        if not rows:
+            return None, None, None
+        problems = [
+            {"problem_slug": slug, "title": title, "difficulty": difficulty, "Rating": rating,
+             "topics": json.loads(topics), "text_hash": th}
+            for slug, title, difficulty, rating, topics, th, _ in rows
+        ]
+        vectors = np.stack([np.frombuffer(row[-1], dtype=np.float32) for row in rows])
+        return problems, vectors, info['model']
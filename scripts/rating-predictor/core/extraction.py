@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Streaming extraction of the raw curriculum pages.
+
+taxonomy_mapping.csv routes each page header (matched by its header_regex)
+to a topic and an English row title. A page is parsed in a single streaming
+pass (html.parser, fed in chunks): H2 headers open sections, H3 headers open
+subtopics, and H4 headers only set the tags (CORE, ADVANCED, ...) of the
+problems that follow. A problem is the first leetcode.cn/problems link of
+a list item (later links in the item point at solutions or related
+problems); links elsewhere (paragraphs, footers) are counted but not
+extracted. Every top-level paragraph and blockquote of a section is kept, so
+the curated descriptions of the existing graph (a hand-picked subset of
+them) can be checked against the page. extract_page is self-contained so it
+can run in a worker process.
+"""
+
+import csv
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+
+PROBLEM_LINK_RE = re.compile(r'leetcode\.cn/problems/([a-z0-9-]+)')
+PROBLEM_ID_RE = re.compile(r'^\s*(\d+)\.\s*')
+PREMIUM_MARKER = '会员题'
+
+# H4 header keywords -> problem tags
+H4_TAGS = (('基础', 'CORE'), ('进阶', 'ADVANCED'), ('选做', 'OPTIONAL'), ('思维', 'THINKING'))
+
+HEADER_LEVELS = {'h2': 2, 'h3': 3, 'h4': 4}
+SKIPPED_TAGS = {'script', 'style', 'svg'}
+PARAGRAPH_TAGS = {'p', 'blockquote'}
+READ_CHUNK = 1 << 16
+
+
+class Route:
+    """One taxonomy_mapping.csv row with its header regex compiled."""
+
+    def __init__(self, row_id, visual_group, topic, row_title, source_file, header_regex):
+        self.row_id = row_id
+        self.visual_group = visual_group
+        self.topic = topic
+        self.row_title = row_title
+        self.source_file = source_file
+        self.header_regex = header_regex
+        self.pattern = re.compile(header_regex)
+
+
+def load_routes(path):
+    """
+    Read taxonomy_mapping.csv.
+
+    Returns:
+        List of Route, in file order (row_id is the data row number)
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return [
+            Route(i, row['visual_group'], row['top_level_topic'], row['row_title'],
+                  row['source_file'], row['header_regex'])
+            for i, row in enumerate(csv.DictReader(f))
+        ]
+
+
+def header_tags(text):
+    """Problem tags implied by an H4 header (the first keyword wins, e.g. 进阶（选做） is ADVANCED)."""
+    return [tag for keyword, tag in H4_TAGS if keyword in text][:1]
+
+
+def clean_text(text):
+    # Collapse ASCII whitespace only: non-breaking spaces are part of the text
+    return re.sub(r'[ \t\n\r\f\v]+', ' ', text).strip(' ')
+
+
+class _PageParser(HTMLParser):
+    """
+    Event-driven page walker.
+
+    Emits headers, description paragraphs and list-item problem links to the
+    callbacks in the order they appear.
+    """
+
+    def __init__(self, on_header, on_paragraph, on_problem):
+        super().__init__(convert_charrefs=True)
+        self.on_header = on_header
+        self.on_paragraph = on_paragraph
+        self.on_problem = on_problem
+        self.links = 0
+        self.header = None      # [level, text parts] while inside h2-h4
+        self.paragraph = None   # [tag, text parts] while inside a top-level <p>/<blockquote>
+        self.items = []         # open <li>: {"text": [...], "problems": [...], "linked": bool}
+        self.anchor = None      # [slug, text parts] while inside a problem link
+        self.skip = None        # [tag, depth] while inside script/style/mathml
+
+    def handle_starttag(self, tag, attrs):
+        if self.skip is not None:
+            if tag == self.skip[0]:
+                self.skip[1] += 1
+            return
+        attrs = dict(attrs)
+        if tag in SKIPPED_TAGS or 'katex-mathml' in (attrs.get('class') or ''):
+            self.skip = [tag, 1]
+        elif tag in HEADER_LEVELS:
+            self.header = [HEADER_LEVELS[tag], []]
+        elif tag == 'li':
+            self.items.append({"text": [], "problems": [], "linked": False})
+        elif tag in PARAGRAPH_TAGS and not self.items and self.paragraph is None:
+            self.paragraph = [tag, []]
+        elif tag == 'a':
+            match = PROBLEM_LINK_RE.search(attrs.get('href') or '')
+            if match:
+                self.links += 1
+                if self.items and not self.items[-1]["linked"]:
+                    self.items[-1]["linked"] = True
+                    self.anchor = [match.group(1), []]
+
+    def handle_endtag(self, tag):
+        if self.skip is not None:
+            if tag == self.skip[0]:
+                self.skip[1] -= 1
+                if self.skip[1] == 0:
+                    self.skip = None
+            return
+        if tag in HEADER_LEVELS and self.header is not None:
+            level, parts = self.header
+            self.header = None
+            self.on_header(level, clean_text(''.join(parts)))
+        elif tag == 'a' and self.anchor is not None:
+            slug, parts = self.anchor
+            self.anchor = None
+            problem = {"slug": slug, "text": clean_text(''.join(parts)), "is_premium": False}
+            self.items[-1]["problems"].append(problem)
+            self.on_problem(problem)
+        elif tag == 'li' and self.items:
+            item = self.items.pop()
+            if PREMIUM_MARKER in ''.join(item["text"]):
+                for problem in item["problems"]:
+                    problem["is_premium"] = True
+        elif self.paragraph is not None and tag == self.paragraph[0]:
+            text = clean_text(''.join(self.paragraph[1]))
+            self.paragraph = None
+            if text:
+                self.on_paragraph(text)
+
+    def handle_data(self, data):
+        if self.skip is not None:
+            return
+        if self.header is not None:
+            self.header[1].append(data)
+        if self.paragraph is not None:
+            self.paragraph[1].append(data)
+        if self.items:
+            self.items[-1]["text"].append(data)
+        if self.anchor is not None:
+            self.anchor[1].append(data)
+
+
+def _node(level, title_zh, route):
+    return {
+        "level": level,
+        "title_zh": title_zh,
+        "row_id": route.row_id if route else None,
+        "paragraphs": [],
+        "problems": [],
+        "subtopics": [],
+    }
+
+
+def extract_page(path, routes):
+    """
+    Parse one page into sections.
+
+    Args:
+        path: HTML file
+        routes: The Route rows whose source_file is this page
+
+    Returns:
+        Dict with the page's "sections" (H2 nodes holding H3 "subtopics";
+        each node has row_id, title_zh, paragraphs and problems), the CSV
+        rows it matched ("matched"), its "unmapped" headers and the number
+        of problem links on the page ("links")
+    """
+    sections, matched, unmapped = [], [], []
+    state = {"section": None, "node": None, "tags": []}
+    unused = list(routes)
+
+    def match(text):
+        for route in unused:
+            if route.pattern.search(text):
+                unused.remove(route)
+                matched.append(route.row_id)
+                return route
+        return None
+
+    def on_header(level, text):
+        route = match(text)
+        if level == 4:
+            state["tags"] = header_tags(text)
+            return
+        if route is None:
+            unmapped.append(text)
+        node = _node(level, text, route)
+        if level == 2 or state["section"] is None:
+            sections.append(node)
+            state["section"] = node
+        else:
+            state["section"]["subtopics"].append(node)
+        state.update(node=node, tags=[])
+
+    def on_paragraph(text):
+        if state["node"] is not None:
+            state["node"]["paragraphs"].append(text)
+
+    def on_problem(problem):
+        if state["node"] is not None:
+            problem["tags"] = list(state["tags"])
+            state["node"]["problems"].append(problem)
+
+    parser = _PageParser(on_header, on_paragraph, on_problem)
+    with open(path, 'r', encoding='utf-8') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), ''):
+            parser.feed(chunk)
+    parser.close()
+
+    for section in sections:
+        for node in [section] + section["subtopics"]:
+            for problem in node["problems"]:
+                match_id = PROBLEM_ID_RE.match(problem.pop("text"))
+                problem["id"] = match_id.group(1) if match_id else None
+
+    return {
+        "page": Path(path).name,
+        "sections": sections,
+        "matched": matched,
+        "unmapped": unmapped,
+        "links": parser.links,
+    }
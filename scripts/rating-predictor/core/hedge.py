@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Hedged requests: race a duplicate against a slow call.
+
+The primary call starts immediately; if it has not produced a valid result
+within the hedge delay, a second call (same or fallback model) is started
+and whichever valid result arrives first wins. Blocking HTTP calls cannot be
+interrupted, so the losing call runs on in a daemon thread and its result
+is discarded.
+"""
+
+import queue
+import threading
+
+
+def hedged_call(primary, hedge, delay, is_valid):
+    """
+    Run primary(), and also hedge() if primary is still pending after delay.
+
+    Args:
+        primary: Zero-argument callable for the first attempt
+        hedge: Zero-argument callable for the duplicate attempt
+        delay: Seconds to wait before hedging
+        is_valid: Predicate telling whether a result may win
+
+    Returns:
+        (winner, result): winner is 0 for primary, 1 for hedge; result is
+        None (winner 0) if neither attempt produced a valid result
+    """
+    results = queue.Queue()
+
+    def run(which, fn):
+        try:
+            results.put((which, fn()))
+        except Exception as e:
+            print(f"  [x] API Error: {e}")
+            results.put((which, None))
+
+    threading.Thread(target=run, args=(0, primary), daemon=True).start()
+    pending = 1
+    try:
+        which, result = results.get(timeout=delay)
+        pending -= 1
+        if is_valid(result):
+            return which, result
+    except queue.Empty:
+        pass
+
+    # Primary is slow (or failed): start the duplicate and take the first valid answer
+    threading.Thread(target=run, args=(1, hedge), daemon=True).start()
+    pending += 1
+    while pending:
+        which, result = results.get()
+        pending -= 1
+        if is_valid(result):
+            return which, result
+    return 0, None
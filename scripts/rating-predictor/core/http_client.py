@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Shared pooled HTTP client with retry, back-off and per-endpoint statistics.
+
+All outbound calls (OpenRouter, the LeetCode metadata APIs) go through one
+requests.Session, so connections are kept alive and reused per host instead
+of paying a new TCP+TLS handshake for every call.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+# Responses worth retrying: throttling and transient server/gateway errors
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Number of recent attempt latencies kept per endpoint for percentiles
+LATENCY_WINDOW = 200
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class EndpointStats:
+    """Counters for one endpoint label."""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, latency):
+        self.requests += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self.recent.append(latency)
+
+
+class HttpClient:
+    """
+    Thread-safe HTTP client with keep-alive connection pools and retries.
+
+    Failed attempts (connection errors, timeouts and RETRY_STATUSES) are
+    retried with jittered exponential back-off; a Retry-After header, when
+    present, takes precedence over the computed delay.
+    """
+
+    def __init__(self, timeout=60, retries=3, backoff=1.0, max_backoff=60.0, pool_size=32):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _endpoint_stats(self, endpoint):
+        with self._lock:
+            return self._stats.setdefault(endpoint, EndpointStats())
+
+    def _delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        cap = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return random.uniform(cap / 2, cap)
+
+    def request(self, method, url, endpoint=None, timeout=None, retries=None, limiter=None, **kwargs):
+        """
+        Send a request, retrying transient failures.
+
+        Args:
+            endpoint: Label used for statistics (defaults to the URL host)
+            timeout: Per-attempt timeout in seconds (defaults to the client's)
+            retries: Retries after the first attempt (defaults to the client's)
+            limiter: Optional RateLimiter; a token is taken before every
+                attempt and 429 responses slow it down
+
+        Returns:
+            The successful requests.Response
+
+        Raises:
+            requests.exceptions.RequestException once retries are exhausted
+            (HTTPError for error statuses)
+        """
+        endpoint = endpoint or urlparse(url).netloc
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        stats = self._endpoint_stats(endpoint)
+
+        for attempt in range(retries + 1):
+            if limiter:
+                limiter.acquire()
+            start = time.monotonic()
+            try:
+                resp = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                with self._lock:
+                    stats.record(time.monotonic() - start)
+                if attempt == retries:
+                    with self._lock:
+                        stats.failures += 1
+                    raise
+                with self._lock:
+                    stats.retries += 1
+                time.sleep(self._delay(attempt))
+                continue
+
+            with self._lock:
+                stats.record(time.monotonic() - start)
+
+            if resp.status_code in RETRY_STATUSES and attempt < retries:
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                with self._lock:
+                    stats.retries += 1
+                if resp.status_code == 429 and limiter:
+                    # The limiter pauses every worker, not just this one
+                    limiter.on_throttle(retry_after)
+                else:
+                    time.sleep(self._delay(attempt, retry_after))
+                continue
+
+            if resp.status_code >= 400:
+                with self._lock:
+                    stats.failures += 1
+            elif limiter:
+                limiter.on_success()
+            resp.raise_for_status()
+            return resp
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        """Snapshot of per-endpoint counters as plain dicts."""
+        with self._lock:
+            return {
+                endpoint: {
+                    "requests": s.requests,
+                    "retries": s.retries,
+                    "failures": s.failures,
+                    "avg_latency": s.total_latency / s.requests if s.requests else 0.0,
+                    "max_latency": s.max_latency,
+                }
+                for endpoint, s in self._stats.items()
+            }
+
+    def latency_percentile(self, endpoint, percentile, min_samples=10):
+        """
+        Latency percentile (seconds) over the endpoint's recent attempts.
+
+        Returns:
+            None until at least min_samples attempts have been recorded
+        """
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            samples = sorted(stats.recent) if stats else []
+        if len(samples) < min_samples:
+            return None
+        rank = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+        return samples[rank]
+
+    def print_stats(self):
+        """Print a one-line summary per endpoint."""
+        stats = self.stats()
+        if not stats:
+            return
+        print("HTTP stats:")
+        for endpoint, s in sorted(stats.items()):
+            print(f"  {endpoint}: {s['requests']} requests, {s['retries']} retries, {s['failures']} failures, "
+                  f"avg {s['avg_latency']:.2f}s, max {s['max_latency']:.2f}s")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide shared HttpClient."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
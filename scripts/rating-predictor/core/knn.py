@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Local kNN rating regressor.
+
+Estimates a rating as the similarity-weighted mean of the contest ratings of
+the nearest reference problems, clamped to the difficulty bounds used by
+SYSTEM_PROMPT. The spread of the neighbour ratings and the best similarity
+say how much to trust the estimate; the cascade mode sends untrusted
+estimates to the LLM instead.
+"""
+
+import math
+from core.prompts import DIFFICULTY_BOUNDS
+
+KNN_ANNOTATOR = "knn"
+
+# Cascade defaults: ask the LLM when the neighbours disagree by more than
+# this (weighted standard deviation, rating points) ...
+DEFAULT_MAX_SPREAD = 200.0
+# ... or when even the closest reference is less similar than this
+DEFAULT_MIN_SIMILARITY = 0.5
+
+
+class KnnEstimate:
+    """A kNN rating estimate with its confidence signals."""
+
+    def __init__(self, rating, spread, top_similarity, count):
+        self.rating = rating
+        self.spread = spread
+        self.top_similarity = top_similarity
+        self.count = count
+
+    def confident(self, max_spread=DEFAULT_MAX_SPREAD, min_similarity=DEFAULT_MIN_SIMILARITY):
+        return self.spread <= max_spread and self.top_similarity >= min_similarity
+
+    def rationale(self):
+        return (f"kNN estimate from {self.count} reference problems "
+                f"(rating spread {self.spread:.0f}, top similarity {self.top_similarity:.2f}).")
+
+
+def knn_estimate(similar_problems, difficulty):
+    """
+    Similarity-weighted rating of the reference problems.
+
+    Args:
+        similar_problems: Reference dicts with "Rating" and "similarity"
+        difficulty: LeetCode base difficulty of the problem being rated
+
+    Returns:
+        KnnEstimate, or None without usable references
+    """
+    refs = [(max(p.get('similarity', 0.0), 0.0), p['Rating']) for p in similar_problems or []]
+    total = sum(w for w, _ in refs)
+    if not refs or total <= 0:
+        return None
+
+    mean = sum(w * r for w, r in refs) / total
+    spread = math.sqrt(sum(w * (r - mean) ** 2 for w, r in refs) / total)
+    low, high = DIFFICULTY_BOUNDS.get(difficulty, (mean, mean))
+    rating = int(round(min(max(mean, low), high)))
+    return KnnEstimate(rating, spread, max(w for w, _ in refs), len(refs))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Offline embedding backend: hashed n-gram TF-IDF over build_embedding_text.
+
+Word unigrams and bigrams are hashed (CRC32, signed) into a fixed number of
+buckets and weighted by sublinear TF times IDF, giving compact float32
+vectors that the regular store and similarity indexes handle unchanged. The
+IDF weights are fitted on the reference corpus at setup time and saved next
+to the store, so queries are embedded the same way with no network access.
+"""
+
+import html
+import re
+import zlib
+import numpy as np
+from core.similarity import normalize_rows
+from core.utils import LOCAL_EMBEDDER_PATH
+
+DEFAULT_DIM = 4096
+
+TAG_RE = re.compile(r'<[^>]+>')
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def features(text):
+    """Hashed unigram and bigram features of a text (CRC32 values)."""
+    words = WORD_RE.findall(html.unescape(TAG_RE.sub(' ', text)).lower())
+    grams = words + [a + ' ' + b for a, b in zip(words, words[1:])]
+    return np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint32, count=len(grams))
+
+
+class HashedTfidfEmbedder:
+    """Vectorizer with fitted IDF weights per hash bucket."""
+
+    def __init__(self, idf):
+        self.idf = idf
+
+    @property
+    def dim(self):
+        return self.idf.shape[0]
+
+    def _term_weights(self, text):
+        """(buckets, signed sublinear TF) for one text; buckets may repeat."""
+        hashes, counts = np.unique(features(text), return_counts=True)
+        buckets = (hashes % self.dim).astype(np.int64)
+        signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+        return buckets, signs * (1.0 + np.log(counts, dtype=np.float32))
+
+    @classmethod
+    def fit(cls, texts, dim=DEFAULT_DIM):
+        """Fit IDF weights (smoothed, per bucket) on a corpus."""
+        embedder = cls(np.ones(dim, dtype=np.float32))
+        df = np.zeros(dim, dtype=np.int64)
+        for text in texts:
+            buckets, _ = embedder._term_weights(text)
+            df[np.unique(buckets)] += 1
+        embedder.idf = (np.log((1 + len(texts)) / (1 + df)) + 1.0).astype(np.float32)
+        return embedder
+
+    def embed(self, texts):
+        """
+        Embed texts.
+
+        Returns:
+            (len(texts), dim) float32 matrix of unit-length rows
+        """
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            buckets, weights = self._term_weights(text)
+            np.add.at(matrix[row], buckets, weights)
+        return normalize_rows(matrix * self.idf)
+
+    def save(self, path=LOCAL_EMBEDDER_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(f, idf=self.idf)
+
+    @classmethod
+    def load(cls, path=LOCAL_EMBEDDER_PATH):
+        with np.load(path) as data:
+            return cls(data['idf'])
+
+
+_embedder = None
+
+
+def get_local_embedder():
+    """The embedder fitted by `setup embeddings --embedder local` (loaded once)."""
+    global _embedder
+    if _embedder is None:
+        if not LOCAL_EMBEDDER_PATH.exists():
+            raise RuntimeError(f"{LOCAL_EMBEDDER_PATH.name} not found. Run setup embeddings --embedder local first.")
+        _embedder = HashedTfidfEmbedder.load()
+    return _embedder
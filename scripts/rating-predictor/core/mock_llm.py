@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Local mock of the OpenRouter endpoints used by the predictor.
+
+Serves /chat/completions and /embeddings on localhost with deterministic
+answers, so backtests and pipeline runs can be exercised without an API key
+or network access. A chat answer is the mean of the reference ratings found
+in the prompt (the tier midpoint without references) plus a small
+prompt-dependent offset, clamped to the difficulty bounds. Point the
+predictor at it with OPENROUTER_API_BASE=http://127.0.0.1:<port>.
+
+Usage:
+    python -m core.mock_llm --port 8765 --latency 0.2
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from core.prompts import DIFFICULTY_BOUNDS
+
+EMBEDDING_DIM = 256
+
+# Pretend price per token, so cost reports have something to add up
+COST_PER_TOKEN = 1e-7
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+
+def mock_rating(prompt):
+    """Deterministic rating for one single-problem user prompt."""
+    difficulty = re.search(r'Base Difficulty: (\w+)', prompt)
+    low, high = DIFFICULTY_BOUNDS.get(difficulty.group(1) if difficulty else '', (1300, 1950))
+    refs = [float(r) for r in re.findall(r'\(Rating: (\d+(?:\.\d+)?)', prompt)]
+    center = sum(refs) / len(refs) if refs else (low + high) / 2
+    offset = int.from_bytes(_digest(prompt)[:2], 'big') % 101 - 50
+    return int(min(max(center + offset, low), high))
+
+
+def mock_embedding(text):
+    """Deterministic pseudo-embedding of a text."""
+    digest = b''.join(_digest(f"{i}:{text}") for i in range(EMBEDDING_DIM // 32))
+    return [b / 255.0 - 0.5 for b in digest]
+
+
+def chat_answer(body):
+    """Assistant message content for a chat completion request."""
+    system = body['messages'][0]['content']
+    prompt = body['messages'][-1]['content']
+    if 'BATCHED REQUESTS' in system:
+        parts = re.split(r'=== PROBLEM: (\S+) ===\n', prompt)[1:]
+        return json.dumps({"predictions": [
+            {"slug": slug, "rationale": "Mock estimate from reference ratings.", "predicted_rating": mock_rating(text)}
+            for slug, text in zip(parts[::2], parts[1::2])
+        ]})
+    return json.dumps({"rationale": "Mock estimate from reference ratings.", "predicted_rating": mock_rating(prompt)})
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        time.sleep(self.latency)
+        if self.path.endswith('/embeddings'):
+            response = {"data": [
+                {"index": i, "embedding": mock_embedding(text)} for i, text in enumerate(body['input'])
+            ]}
+        elif self.path.endswith('/chat/completions'):
+            content = chat_answer(body)
+            prompt_tokens = sum(len(m['content']) for m in body['messages']) // 4
+            completion_tokens = len(content) // 4
+            response = {
+                "model": body.get('model'),
+                "choices": [{"message": {"role": "assistant", "content": content}}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                    "cost": (prompt_tokens + completion_tokens) * COST_PER_TOKEN,
+                },
+            }
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(port=0, latency=0.0):
+    """
+    Start the mock in a background thread.
+
+    Returns:
+        (server, base_url); call server.shutdown() to stop it
+    """
+    handler = type('Handler', (MockHandler,), {'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock OpenRouter endpoint")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before every answer (default: 0)")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(args.port, args.latency)
+    print(f"Mock OpenRouter listening on {base_url} (set OPENROUTER_API_BASE={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
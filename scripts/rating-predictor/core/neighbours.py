@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Precomputed neighbour table: slug -> top-k reference slugs with scores.
+
+Written by `predict prepare` and read by the prediction stage, so the LLM
+phase does no embedding or similarity work. Each entry records the hash of
+the embedding text it was computed from, and the table records the
+embedding store it was searched against; stale entries are ignored.
+"""
+
+import json
+from core.store import store_fingerprint
+from core.utils import build_embedding_text, text_hash, write_json_atomic, EMBEDDINGS_META_PATH, NEIGHBOURS_PATH
+
+TABLE_VERSION = 1
+
+
+def load_neighbour_table(path=NEIGHBOURS_PATH):
+    """
+    Load the neighbour table.
+
+    Returns:
+        Dict slug -> {"text_hash": ..., "neighbours": [[ref_slug, score], ...]},
+        or None if there is no table for the current embedding store
+    """
+    if not path.exists() or not EMBEDDINGS_META_PATH.exists():
+        return None
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if data.get('version') != TABLE_VERSION or data.get('store') != store_fingerprint():
+        return None
+    return data['slugs']
+
+
+def current_entry(table, slug, meta):
+    """
+    Table entry for slug, if it was computed from meta's current embedding text.
+
+    Returns:
+        Entry dict, or None when the table has no entry or the entry is stale
+    """
+    entry = (table or {}).get(slug)
+    if not entry or entry['text_hash'] != text_hash(build_embedding_text(meta)):
+        return None
+    return entry
+
+
+def save_neighbour_table(entries, k, model, path=NEIGHBOURS_PATH):
+    """Persist the neighbour table for the current embedding store."""
+    write_json_atomic(path, {
+        "version": TABLE_VERSION,
+        "embeddings_model": model,
+        "store": store_fingerprint(),
+        "k": k,
+        "slugs": entries,
+    })
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Slug-indexed SQLite store for merged_problems.json.
+
+merged_problems.json carries full HTML descriptions, solutions and hints for
+every LeetCode question. It is converted once (streaming, without holding the
+whole file in memory) into an SQLite table keyed by slug; lookups then load a
+single record on demand instead of parsing the whole file on every run.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from core.utils import iter_json_array, RAW_DATA_PATH, PROBLEMS_DB_PATH
+
+STORE_VERSION = 1
+
+
+def _source_signature(source):
+    stat = source.stat()
+    return {"version": STORE_VERSION, "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def build_problem_store(source=RAW_DATA_PATH, path=PROBLEMS_DB_PATH):
+    """
+    Convert merged_problems.json into the slug-indexed store.
+
+    Returns:
+        Number of problems written
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    conn = sqlite3.connect(str(tmp_path))
+    conn.execute("CREATE TABLE problems (slug TEXT PRIMARY KEY, record TEXT NOT NULL)")
+    conn.execute("CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    count = 0
+    batch = []
+    for question in iter_json_array(source, "questions"):
+        batch.append((question["problem_slug"], json.dumps(question, ensure_ascii=False)))
+        if len(batch) >= 1000:
+            conn.executemany("INSERT OR REPLACE INTO problems VALUES (?, ?)", batch)
+            count += len(batch)
+            batch = []
+    conn.executemany("INSERT OR REPLACE INTO problems VALUES (?, ?)", batch)
+    count += len(batch)
+    conn.execute("INSERT INTO info VALUES ('source', ?)", (json.dumps(_source_signature(source)),))
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, path)
+    return count
+
+
+def store_is_fresh(source=RAW_DATA_PATH, path=PROBLEMS_DB_PATH):
+    """True if the store exists and was built from the current source file."""
+    if not path.exists():
+        return False
+    conn = sqlite3.connect(str(path))
+    try:
+        row = conn.execute("SELECT value FROM info WHERE key = 'source'").fetchone()
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+    return row is not None and json.loads(row[0]) == _source_signature(source)
+
+
+class ProblemStore:
+    """
+    Read-only, dict-like view of the store (get, `in`, len, iteration).
+
+    Records are decoded lazily, one slug at a time. Safe to share between
+    worker threads.
+    """
+
+    def __init__(self, path=PROBLEMS_DB_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def get(self, slug, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT record FROM problems WHERE slug = ?", (slug,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def __getitem__(self, slug):
+        record = self.get(slug)
+        if record is None:
+            raise KeyError(slug)
+        return record
+
+    def __contains__(self, slug):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM problems WHERE slug = ?", (slug,)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM problems").fetchone()[0]
+
+    def __iter__(self):
+        with self._lock:
+            slugs = [row[0] for row in self._conn.execute("SELECT slug FROM problems")]
+        return iter(slugs)
+
+    def values(self):
+        """Iterate over all records (streamed from SQLite)."""
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            for (record,) in conn.execute("SELECT record FROM problems"):
+                yield json.loads(record)
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -3,6 +3,13 @@
 System and user prompts for the rating predictor.
 """
 
+# LeetCode base difficulty -> allowed rating range (mirrors SYSTEM_PROMPT)
+DIFFICULTY_BOUNDS = {
+    "Easy": (800, 1350),
+    "Medium": (1300, 1950),
+    "Hard": (1900, 2800),
+}
+
 SYSTEM_PROMPT = """
 You are an expert competitive programming judge and LeetCode problem difficulty estimator.
 Your task is to predict the Elo-style micro-rating for a given programming problem.
@@ -84,6 +91,37 @@ Example Output (for a Medium problem):
 }
 """
 
+# Batched mode: several problems per request, one JSON object listing every answer
+BATCH_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+=== BATCHED REQUESTS (OVERRIDES THE OUTPUT FORMAT ABOVE) ===
+
+This request contains SEVERAL problems, each starting with a line "=== PROBLEM: <slug> ===" and followed by its own reference problems. Rate every problem independently, applying all the rules above to each one.
+
+You must output ONLY a valid JSON object with a single key "predictions": an array with exactly one entry per problem, in the order given. Each entry has exactly three keys:
+- "slug": the problem's slug, copied exactly from its header line
+- "rationale": as described above
+- "predicted_rating": as described above
+
+Example Output (for two problems):
+{
+  "predictions": [
+    {"slug": "two-sum", "rationale": "...", "predicted_rating": 1187},
+    {"slug": "lru-cache", "rationale": "...", "predicted_rating": 1743}
+  ]
+}
+"""
+
+
+def within_bounds(difficulty, rating):
+    """True if rating is inside the difficulty's allowed range (unknown difficulties always pass)."""
+    low, high = DIFFICULTY_BOUNDS.get(difficulty, (float('-inf'), float('inf')))
+    return low <= rating <= high
+
+
+def build_batch_prompt(items):
+    """Build the user prompt for a batched request from (slug, user_prompt) pairs."""
+    return "\n".join(f"=== PROBLEM: {slug} ===\n{prompt}" for slug, prompt in items)
+
 
 def build_user_prompt(problem_meta, similar_problems=None):
     """Build the user prompt for a prediction request."""
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Thread-safe token-bucket rate limiter with adaptive back-off on HTTP 429.
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all worker threads.
+
+    The refill rate starts at `rate` requests/second. Every throttled response
+    (HTTP 429) halves the current rate and pauses all callers for the
+    Retry-After delay; every success grows the rate back additively until it
+    reaches the configured ceiling again (AIMD).
+    """
+
+    def __init__(self, rate, burst=None, min_rate=0.1):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min_rate
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1.0:
+                        self.tokens -= 1.0
+                        return
+                    wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        """Additive increase back towards the configured rate."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_throttle(self, retry_after=None):
+        """
+        Multiplicative decrease after a 429.
+
+        Args:
+            retry_after: Seconds the server asked us to wait (defaults to one
+                refill interval at the reduced rate)
+        """
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            delay = retry_after if retry_after is not None else 1.0 / self.rate
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self.updated = self.paused_until
+            self.tokens = 0.0
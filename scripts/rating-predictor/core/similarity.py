@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Vectorized cosine-similarity search over reference embeddings.
+"""
+
+import numpy as np
+
+
+def normalize_rows(matrix):
+    """Return a float32 copy of matrix with every row scaled to unit length."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[np.newaxis, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(scores, k):
+    """
+    Select the k best columns of each row of a (queries x references) score matrix.
+
+    Uses a partial selection (argpartition) and only sorts the k survivors.
+
+    Returns:
+        (indices, scores) arrays of shape (queries, k), best first
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    return (np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(candidate_scores, order, axis=1))
+
+
+class SimilarityIndex:
+    """
+    Exact cosine-similarity index over a fixed set of reference embeddings.
+
+    The references are normalized once into a contiguous float32 matrix, so a
+    query (or a whole batch of queries) is scored with a single matrix product.
+    Pass normalized=True for vectors that are already unit length (e.g. a
+    memory-mapped embedding store) to use them in place without a copy.
+    """
+
+    def __init__(self, embeddings, normalized=False):
+        if normalized:
+            self.matrix = np.asarray(embeddings, dtype=np.float32)
+        else:
+            self.matrix = normalize_rows(embeddings)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def search_batch(self, queries, k=5):
+        """
+        Find the k nearest references for every row of queries.
+
+        Returns:
+            (indices, scores) arrays of shape (len(queries), k), best first
+        """
+        queries = normalize_rows(queries)
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match index dimension {self.dim}")
+        return top_k(queries @ self.matrix.T, k)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Binary embedding store: a memory-mapped float32 .npy matrix plus a JSONL
+metadata sidecar.
+
+The first line of the sidecar is a small header (model, dim, count, ...);
+every following line describes one reference problem, in the same row order
+as the vector matrix. Vectors are stored pre-normalized to unit length.
+"""
+
+import json
+import os
+import numpy as np
+from core.similarity import normalize_rows
+from core.utils import (
+    build_embedding_text,
+    text_hash,
+    EMBEDDINGS_PATH,
+    EMBEDDINGS_META_PATH,
+    LEGACY_EMBEDDINGS_PATH,
+)
+
+STORE_VERSION = 1
+
+# Reference fields kept in the metadata sidecar (enough for build_user_prompt,
+# plus the embedding text hash used by incremental rebuilds)
+META_FIELDS = ('problem_slug', 'title', 'difficulty', 'Rating', 'topics', 'text_hash')
+
+
+def _atomic_write(path, write):
+    """Write a file via a temp file + rename so readers never see a partial file."""
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_embedding_store(problems, vectors, model,
+                          vectors_path=EMBEDDINGS_PATH, meta_path=EMBEDDINGS_META_PATH):
+    """
+    Write reference problems and their embeddings as a binary store.
+
+    Args:
+        problems: List of problem dicts (same order as vectors)
+        vectors: (count, dim) array-like of embeddings
+        model: Embedding model name recorded in the header
+    """
+    matrix = normalize_rows(vectors)
+    if matrix.shape[0] != len(problems):
+        raise ValueError(f"Got {matrix.shape[0]} vectors for {len(problems)} problems")
+
+    header = {
+        "version": STORE_VERSION,
+        "model": model,
+        "dim": int(matrix.shape[1]),
+        "count": int(matrix.shape[0]),
+        "normalized": True,
+    }
+
+    vectors_path.parent.mkdir(parents=True, exist_ok=True)
+    _atomic_write(vectors_path, lambda f: np.save(f, matrix))
+
+    def write_meta(f):
+        f.write((json.dumps(header) + "\n").encode('utf-8'))
+        for problem in problems:
+            row = {field: problem.get(field) for field in META_FIELDS}
+            f.write((json.dumps(row, ensure_ascii=False) + "\n").encode('utf-8'))
+
+    _atomic_write(meta_path, write_meta)
+    return header
+
+
+def read_store_header(meta_path=EMBEDDINGS_META_PATH):
+    """Read only the header line of the metadata sidecar (None if missing)."""
+    if not meta_path.exists():
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        return json.loads(f.readline())
+
+
+def store_fingerprint(meta_path=EMBEDDINGS_META_PATH):
+    """Identify the store that derived artifacts were built from (hash of its sidecar)."""
+    with open(meta_path, 'rb') as f:
+        return text_hash(f.read().decode('utf-8'))
+
+
+def open_embedding_store(vectors_path=EMBEDDINGS_PATH, meta_path=EMBEDDINGS_META_PATH):
+    """
+    Open the binary store.
+
+    Returns:
+        (header, problems, vectors) where vectors is a read-only memory map,
+        or (None, None, None) if the store does not exist
+    """
+    if not vectors_path.exists() or not meta_path.exists():
+        return None, None, None
+
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        problems = [json.loads(line) for line in f if line.strip()]
+
+    vectors = np.load(vectors_path, mmap_mode='r')
+    if vectors.shape != (header['count'], header['dim']) or len(problems) != header['count']:
+        raise ValueError(
+            f"Embedding store is inconsistent: header says {header['count']}x{header['dim']}, "
+            f"found {len(problems)} rows and vectors of shape {vectors.shape}"
+        )
+    return header, problems, vectors
+
+
+def load_embeddings():
+    """
+    Load pre-computed reference embeddings.
+
+    Returns:
+        (problems, vectors) or (None, None) if no store exists
+    """
+    _, problems, vectors = open_embedding_store()
+    if problems is None and LEGACY_EMBEDDINGS_PATH.exists():
+        print(f"  [!] Found legacy {LEGACY_EMBEDDINGS_PATH.name}; run 'python cli.py setup convert' to migrate it.")
+    return problems, vectors
+
+
+def load_references():
+    """
+    Load the reference set for similarity search.
+
+    With the SQLite dataset enabled, references come from its refs/embeddings
+    tables as long as they were written from the current binary store (or
+    the store is gone); otherwise from the binary store itself.
+
+    Returns:
+        (problems, vectors, model) or (None, None, None) if there are no references
+    """
+    from core.dataset import Dataset, dataset_enabled  # lazy: the dataset is optional
+    if dataset_enabled():
+        store = store_fingerprint() if EMBEDDINGS_META_PATH.exists() else None
+        problems, vectors, model = Dataset().load_references(store)
+        if problems:
+            return problems, vectors, model
+    problems, vectors = load_embeddings()
+    if not problems:
+        return None, None, None
+    return problems, vectors, read_store_header()['model']
+
+
+def convert_legacy_embeddings(json_path=LEGACY_EMBEDDINGS_PATH):
+    """Convert a legacy zerotrac_embeddings.json file into the binary store."""
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+    problems = data['problems']
+    for problem in problems:
+        problem['text_hash'] = text_hash(build_embedding_text(problem))
+    vectors = np.array([p['embedding'] for p in problems], dtype=np.float32)
+    return write_embedding_store(problems, vectors, data.get('model', 'unknown'))
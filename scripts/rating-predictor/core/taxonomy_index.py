@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Slug-location index over the taxonomy graph files.
+
+Maps every problem slug to each place it appears:
+(file, topic, section, subtopic, position), together with the rating state
+found there. Each file's entry is keyed by the SHA-256 of its contents and
+rebuilt only when that hash changes, so collect and apply become index
+lookups instead of full walks of every taxonomy file.
+"""
+
+import hashlib
+import json
+from core.utils import get_taxonomy_files, write_json_atomic, TAXONOMY_INDEX_PATH
+
+INDEX_VERSION = 1
+
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def iter_problem_lists(taxonomy):
+    """
+    Yield (topic_idx, section_idx, subtopic_idx, problems) for every problem list.
+
+    subtopic_idx is None for problems attached directly to a section.
+    """
+    for t, topic in enumerate(taxonomy):
+        for s, section in enumerate(topic.get('sections', [])):
+            yield t, s, None, section.get('problems', [])
+            for st, sub in enumerate(section.get('subtopics', [])):
+                yield t, s, st, sub.get('problems', [])
+
+
+def index_taxonomy(taxonomy):
+    """
+    Build the location map for one parsed taxonomy file.
+
+    Returns:
+        Dict mapping slug -> list of [topic, section, subtopic, position, rating, is_predicted]
+    """
+    locations = {}
+    for t, s, st, problems in iter_problem_lists(taxonomy):
+        for pos, prob in enumerate(problems):
+            locations.setdefault(prob['slug'], []).append(
+                [t, s, st, pos, prob.get('rating'), prob.get('is_predicted') is True]
+            )
+    return locations
+
+
+def get_problem_list(taxonomy, topic, section, subtopic):
+    """Return the problem list a location refers to."""
+    sec = taxonomy[topic]['sections'][section]
+    if subtopic is None:
+        return sec['problems']
+    return sec['subtopics'][subtopic]['problems']
+
+
+def location_label(taxonomy, topic, section, subtopic):
+    """Human-readable 'topic > section > subtopic' path for reports."""
+    sec = taxonomy[topic]['sections'][section]
+    parts = [taxonomy[topic].get('id', str(topic)), sec.get('title', str(section))]
+    if subtopic is not None:
+        parts.append(sec['subtopics'][subtopic].get('title', str(subtopic)))
+    return ' > '.join(parts)
+
+
+def needs_prediction(location):
+    """Same rule the taxonomy walk used: predicted (re-predictable) or unrated."""
+    return location[5] or location[4] is None
+
+
+class TaxonomyIndex:
+    """In-memory view of the persisted index, refreshed against file hashes."""
+
+    def __init__(self, files):
+        self.files = files  # file name -> {"sha256": ..., "locations": {...}}
+
+    @classmethod
+    def load(cls, path=TAXONOMY_INDEX_PATH):
+        """
+        Load the index and rebuild entries for any taxonomy file whose hash changed.
+
+        The index is re-saved only when something was rebuilt.
+        """
+        files = {}
+        if path.exists():
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                files = data['files']
+
+        current = {fp.name: fp for fp in get_taxonomy_files() if fp.exists()}
+        dirty = set(files) - set(current)
+        for name in dirty:
+            del files[name]
+        for name, filepath in current.items():
+            digest = file_sha256(filepath)
+            if files.get(name, {}).get('sha256') != digest:
+                with open(filepath, 'r') as f:
+                    files[name] = {"sha256": digest, "locations": index_taxonomy(json.load(f))}
+                dirty.add(name)
+
+        index = cls(files)
+        if dirty:
+            index.save(path)
+        return index
+
+    def save(self, path=TAXONOMY_INDEX_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(path, {"version": INDEX_VERSION, "files": self.files})
+
+    def update_file(self, name, taxonomy, digest):
+        """Replace one file's entry after it has been rewritten."""
+        self.files[name] = {"sha256": digest, "locations": index_taxonomy(taxonomy)}
+
+    def locations(self, slug):
+        """Yield (file name, location) for every occurrence of slug."""
+        for name, entry in self.files.items():
+            for loc in entry['locations'].get(slug, []):
+                yield name, loc
+
+    def slugs_to_predict(self):
+        """All slugs with at least one occurrence that needs a (re-)prediction."""
+        return {
+            slug
+            for entry in self.files.values()
+            for slug, locs in entry['locations'].items()
+            if any(needs_prediction(loc) for loc in locs)
+        }
+
+
+def collect_slugs_to_predict():
+    """Collect all slugs that need prediction from taxonomy files."""
+    return TaxonomyIndex.load().slugs_to_predict()
@@ -3,9 +3,12 @@
 Shared utilities for the rating predictor CLI.
 """
 
+import fcntl
+import hashlib
 import json
-import math
-import requests
+import os
+import re
+from contextlib import contextmanager
 from pathlib import Path
 
 # Paths (relative to this file's location in core/)
@@ -15,16 +18,42 @@ PROJECT_ROOT = RATING_PREDICTOR_DIR.parent.parent  # Go up to endlesscode-io/
 DATA_DIR = PROJECT_ROOT / "src" / "data"
 RAW_DATA_PATH = PROJECT_ROOT / "src" / "raw-data" / "merged_problems.json"
 ZEROTRAC_PATH = PROJECT_ROOT / "src" / "raw-data" / "zerotrac.json"
+RAW_PAGES_DIR = PROJECT_ROOT / "src" / "raw-data" / "raw_pages" / "full-practice"
+TAXONOMY_MAPPING_PATH = PROJECT_ROOT / "src" / "raw-data" / "taxonomy_mapping.csv"
 API_KEY_PATH = RATING_PREDICTOR_DIR / "api_key.txt"
 PREDICTIONS_PATH = RATING_PREDICTOR_DIR / "data" / "predictions.json"
-EMBEDDINGS_PATH = RATING_PREDICTOR_DIR / "data" / "zerotrac_embeddings.json"
+PREDICTIONS_JOURNAL_PATH = RATING_PREDICTOR_DIR / "data" / "predictions.jsonl"
+EMBEDDINGS_PATH = RATING_PREDICTOR_DIR / "data" / "zerotrac_embeddings.npy"
+EMBEDDINGS_META_PATH = RATING_PREDICTOR_DIR / "data" / "zerotrac_embeddings.meta.jsonl"
+LEGACY_EMBEDDINGS_PATH = RATING_PREDICTOR_DIR / "data" / "zerotrac_embeddings.json"
+ANN_INDEX_PATH = RATING_PREDICTOR_DIR / "data" / "zerotrac_embeddings.ivf.npz"
+NEIGHBOURS_PATH = RATING_PREDICTOR_DIR / "data" / "neighbours.json"
+LOCAL_EMBEDDER_PATH = RATING_PREDICTOR_DIR / "data" / "local_embedder.npz"
 MERGED_RATING_PATH = RATING_PREDICTOR_DIR / "data" / "merged_with_rating.json"
+JOIN_CHANGES_PATH = RATING_PREDICTOR_DIR / "data" / "join_changes.json"
+EMBEDDING_CACHE_PATH = RATING_PREDICTOR_DIR / "data" / "embedding_cache.sqlite"
+META_CACHE_PATH = RATING_PREDICTOR_DIR / "data" / "meta_cache.sqlite"
+RESPONSE_CACHE_PATH = RATING_PREDICTOR_DIR / "data" / "response_cache.sqlite"
+COMPACT_CACHE_PATH = RATING_PREDICTOR_DIR / "data" / "compact_cache.sqlite"
+TAXONOMY_INDEX_PATH = RATING_PREDICTOR_DIR / "data" / "taxonomy_index.json"
+EXTRACTION_MANIFEST_PATH = RATING_PREDICTOR_DIR / "data" / "extraction_manifest.json"
+PROBLEMS_DB_PATH = RATING_PREDICTOR_DIR / "data" / "merged_problems.sqlite"
+DATASET_DB_PATH = RATING_PREDICTOR_DIR / "data" / "dataset.sqlite"
+
+# OpenRouter API base URL (override with OPENROUTER_API_BASE, e.g. for a local mock)
+OPENROUTER_API_BASE = "https://openrouter.ai/api/v1"
 
 # Models
 EMBEDDINGS_MODEL = "qwen/qwen3-embedding-8b"
+LOCAL_EMBEDDINGS_MODEL = "local/hashed-tfidf"
 DEFAULT_PREDICT_MODEL = "deepseek/deepseek-v4-flash"
 
 
+def openrouter_url(path):
+    """Full URL of an OpenRouter API path such as "/chat/completions"."""
+    return os.environ.get("OPENROUTER_API_BASE", OPENROUTER_API_BASE).rstrip('/') + path
+
+
 def get_api_key():
     """Load API key from file."""
     if not API_KEY_PATH.exists():
@@ -38,13 +67,83 @@ def get_api_key():
     return key
 
 
+def iter_json_array(path, key=None, chunk_size=1 << 20):
+    """
+    Stream the elements of a JSON array without loading the whole file.
+
+    With key=None the file itself must be an array; otherwise the array is
+    the value stored under key in the top-level object. Only one chunk plus
+    the element being decoded is held in memory at a time.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = ''
+        eof = False
+
+        def fill():
+            nonlocal buf, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buf += chunk
+
+        # Find `[` (or `"key": [`)
+        if key is None:
+            find_opening = re.compile(r'\s*(\S)').match
+        else:
+            find_opening = re.compile(re.escape(json.dumps(key)) + r'\s*:\s*(\S)').search
+        while True:
+            match = find_opening(buf)
+            if match:
+                if match.group(1) != '[':
+                    raise ValueError(f"{path}: '{key or '<root>'}' is not an array")
+                buf = buf[match.end():]
+                break
+            if eof:
+                raise ValueError(f"{path}: key '{key}' not found")
+            fill()
+
+        pos = 0
+        while True:
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                fill()
+            if pos >= len(buf):
+                raise ValueError(f"{path}: unterminated array '{key or '<root>'}'")
+            if buf[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            yield item
+            pos = end
+            if pos > chunk_size:
+                buf = buf[pos:]
+                pos = 0
+
+
 def load_merged_problems():
-    """Load merged_problems.json and create slug lookup."""
-    print("Loading merged_problems.json...")
-    with open(RAW_DATA_PATH, 'r') as f:
-        data = json.load(f)
-    lookup = {q["problem_slug"]: q for q in data.get("questions", [])}
-    return lookup
+    """
+    Open the slug lookup over merged_problems.json.
+
+    Returns a lazily-loading, dict-like ProblemStore. The slug-indexed store is
+    (re)built from merged_problems.json the first time, and whenever that file
+    changes.
+    """
+    from core.problem_store import ProblemStore, build_problem_store, store_is_fresh
+
+    if not store_is_fresh():
+        print("Indexing merged_problems.json (one-time conversion)...")
+        count = build_problem_store()
+        print(f"Indexed {count} problems into {PROBLEMS_DB_PATH.name}.")
+    return ProblemStore()
 
 
 def load_zerotrac():
@@ -54,29 +153,159 @@ def load_zerotrac():
         return json.load(f)
 
 
+def replay_journal(predictions, journal_path=PREDICTIONS_JOURNAL_PATH):
+    """Apply journal entries on top of a predictions dict (in place)."""
+    if not journal_path.exists():
+        return predictions
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn final line from a crash mid-append; everything before it is intact
+                continue
+            predictions[entry['slug']] = entry['prediction']
+    return predictions
+
+
 def load_predictions():
-    """Load existing predictions cache."""
+    """Load existing predictions: the snapshot plus any journaled updates."""
+    predictions = {}
     if PREDICTIONS_PATH.exists():
         with open(PREDICTIONS_PATH, 'r') as f:
-            return json.load(f)
-    return {}
+            predictions = json.load(f)
+    return replay_journal(predictions)
+
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """Write JSON via a temp file + rename so readers never see a partial file."""
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def sidecar_path(path):
+    return path.with_name(path.stem + '.meta.json')
+
+
+def write_count_sidecar(path, count):
+    """
+    Record the entry count of a large JSON file next to it.
+
+    The sidecar also stores the file's size and mtime, so readers can tell
+    when it no longer describes the file.
+    """
+    stat = path.stat()
+    write_json_atomic(sidecar_path(path), {"count": count, "size": stat.st_size, "mtime": stat.st_mtime})
+
+
+def read_count_sidecar(path):
+    """Entry count recorded for path, or None if the sidecar is missing or stale."""
+    meta_path = sidecar_path(path)
+    if not path.exists() or not meta_path.exists():
+        return None
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+    stat = path.stat()
+    if meta.get('size') != stat.st_size or meta.get('mtime') != stat.st_mtime:
+        return None
+    return meta['count']
 
 
 def save_predictions(predictions):
-    """Save predictions to cache."""
-    with open(PREDICTIONS_PATH, 'w') as f:
-        json.dump(predictions, f, indent=2)
+    """Atomically replace the predictions snapshot."""
+    write_json_atomic(PREDICTIONS_PATH, predictions, indent=2)
+    write_count_sidecar(PREDICTIONS_PATH, len(predictions))
 
 
-def load_embeddings():
-    """Load pre-computed embeddings."""
-    if not EMBEDDINGS_PATH.exists():
-        return None, None
-    with open(EMBEDDINGS_PATH, 'r') as f:
-        data = json.load(f)
-    problems = data['problems']
-    embeddings = [p['embedding'] for p in problems]
-    return problems, embeddings
+def compact_predictions():
+    """
+    Fold the journal into the snapshot.
+
+    The journal is held under an exclusive flock for the whole fold, so a
+    PredictionJournal in another process cannot append between the read and
+    the truncate. The snapshot is replaced atomically before the journal is
+    truncated, and replaying a journal over a snapshot that already contains
+    it is a no-op, so a crash at any point loses nothing.
+
+    Returns:
+        (total predictions, journal entries folded in)
+    """
+    if not PREDICTIONS_JOURNAL_PATH.exists():
+        return len(load_predictions()), 0
+    with open(PREDICTIONS_JOURNAL_PATH, 'r+b') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            entries = sum(1 for _ in f)
+            predictions = load_predictions()
+            if entries:
+                save_predictions(predictions)
+                f.truncate(0)
+                os.fsync(f.fileno())
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+    return len(predictions), entries
+
+
+class PredictionJournal:
+    """
+    Append-only JSONL journal of new predictions.
+
+    Each append is one line, so writes are O(1) per prediction; lines are
+    fsynced in batches of fsync_every (and on close). Every write takes an
+    exclusive flock on the journal, so it cannot interleave with
+    compact_predictions in another process.
+    """
+
+    def __init__(self, path=PREDICTIONS_JOURNAL_PATH, fsync_every=16):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.fsync_every = fsync_every
+        self._pending = 0
+        self._file = open(path, 'a', encoding='utf-8')
+        # Terminate a torn final line so the next entry starts on its own line
+        with self._locked():
+            if path.stat().st_size:
+                with open(path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        self._file.write('\n')
+
+    @contextmanager
+    def _locked(self):
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            yield
+            self._file.flush()
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    def append(self, slug, prediction):
+        """Record one prediction (flushed immediately, fsynced in batches)."""
+        line = json.dumps({"slug": slug, "prediction": prediction}, ensure_ascii=False) + "\n"
+        with self._locked():
+            self._file.write(line)
+        self._pending += 1
+        if self._pending >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        """Force journaled lines to disk."""
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def close(self):
+        if self._pending:
+            self.sync()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 
 def build_embedding_text(problem_meta):
@@ -98,38 +327,140 @@ def build_embedding_text(problem_meta):
     return text
 
 
-def generate_embedding(api_key, text, model=EMBEDDINGS_MODEL):
-    """Generate embedding for a single text using OpenRouter."""
+def text_hash(text):
+    """Content hash of a text (used to address cached and stored embeddings)."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def generate_embeddings(api_key, texts, model=EMBEDDINGS_MODEL, timeout=120, retries=None):
+    """
+    Generate embeddings for several texts in a single OpenRouter request.
+
+    Transient HTTP failures are retried by the shared client; anything still
+    failing (or a malformed response) raises.
+
+    Returns:
+        List of embedding vectors, in the same order as texts
+    """
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
-    payload = {"model": model, "input": [text]}
+    payload = {"model": model, "input": list(texts)}
+    from core.http_client import get_client  # lazy: keeps requests out of light commands
+    resp = get_client().post(
+        openrouter_url("/embeddings"),
+        endpoint="openrouter.embeddings",
+        headers=headers,
+        json=payload,
+        timeout=timeout,
+        retries=retries,
+    )
+    data = resp.json()['data']
+    if len(data) != len(texts):
+        raise ValueError(f"Expected {len(texts)} embeddings, got {len(data)}")
+    data.sort(key=lambda item: item.get('index', 0))
+    return [item['embedding'] for item in data]
+
+
+def generate_embedding(api_key, text, model=EMBEDDINGS_MODEL):
+    """Generate embedding for a single text using OpenRouter."""
     try:
-        resp = requests.post(
-            "https://openrouter.ai/api/v1/embeddings",
-            headers=headers,
-            json=payload,
-            timeout=60
-        )
-        resp.raise_for_status()
-        return resp.json()['data'][0]['embedding']
+        return generate_embeddings(api_key, [text], model=model, timeout=60)[0]
     except Exception as e:
         print(f"  [x] Failed to generate embedding: {e}")
         return None
 
 
-def cosine_similarity(a, b):
-    """Calculate cosine similarity between two vectors."""
-    dot_product = sum(x * y for x, y in zip(a, b))
-    magnitude_a = math.sqrt(sum(x * x for x in a))
-    magnitude_b = math.sqrt(sum(y * y for y in b))
-    if magnitude_a == 0 or magnitude_b == 0:
-        return 0
-    return dot_product / (magnitude_a * magnitude_b)
+def embed_query(api_key, text, cache=None, model=EMBEDDINGS_MODEL):
+    """Embed a single query text, going through the embedding cache if given."""
+    if model == LOCAL_EMBEDDINGS_MODEL:
+        # Offline backend: cheaper to recompute than to look up
+        from core.local_embedder import get_local_embedder
+        return get_local_embedder().embed([text])[0]
+    if cache is not None:
+        cached = cache.get(model, text)
+        if cached is not None:
+            return cached
+    embedding = generate_embedding(api_key, text, model=model)
+    if embedding and cache is not None:
+        cache.put(model, text, embedding)
+    return embedding
+
+
+def generate_embeddings_batched(api_key, texts, model=EMBEDDINGS_MODEL,
+                                batch_size=100, concurrency=4, retries=3, on_batch=None):
+    """
+    Embed many texts using multi-input requests, several batches in flight at once.
+
+    Each batch is retried by the shared HTTP client with jittered back-off; if
+    a batch still fails the whole run fails (no placeholder vectors are ever
+    substituted).
+
+    Args:
+        texts: List of texts to embed
+        batch_size: Number of texts per request
+        concurrency: Maximum number of requests in flight
+        retries: Extra attempts per batch after the first failure
+        on_batch: Optional callback(texts, vectors), called from the calling
+            thread as each batch completes
+
+    Returns:
+        List of embedding vectors, in the same order as texts
+
+    Raises:
+        RuntimeError: If any batch fails after all retries
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    def embed_batch(start):
+        batch = texts[start:start + batch_size]
+        try:
+            return generate_embeddings(api_key, batch, model=model, retries=retries)
+        except Exception as e:
+            raise RuntimeError(f"Batch {start + 1}-{start + len(batch)} failed after {retries + 1} attempts: {e}") from e
+
+    results = [None] * len(texts)
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(embed_batch, start): start for start in range(0, len(texts), batch_size)}
+        try:
+            for future in as_completed(futures):
+                start = futures[future]
+                vectors = future.result()
+                results[start:start + len(vectors)] = vectors
+                if on_batch:
+                    on_batch(texts[start:start + len(vectors)], vectors)
+                done += len(vectors)
+                print(f"  Embedded {done}/{len(texts)}")
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return results
+
+
+def reference_results(problems_with_embeddings, indices, scores=None):
+    """
+    Turn a row of reference indices into problem dicts (without embedding field).
+
+    If scores are given, each dict also gets its cosine "similarity".
+    """
+    results = []
+    for i, idx in enumerate(indices):
+        if idx < 0:
+            # Padding from an approximate index that found fewer than k candidates
+            continue
+        problem = problems_with_embeddings[int(idx)].copy()
+        problem.pop('embedding', None)
+        if scores is not None:
+            problem['similarity'] = float(scores[i])
+        results.append(problem)
+    return results
 
 
-def find_similar_problems(problem_meta, api_key, problems_with_embeddings, embeddings, k=5):
+def find_similar_problems(problem_meta, api_key, problems_with_embeddings, index, k=5, cache=None,
+                          model=EMBEDDINGS_MODEL):
     """
     Find k most similar problems to given problem_meta.
 
@@ -137,83 +468,155 @@ def find_similar_problems(problem_meta, api_key, problems_with_embeddings, embed
         problem_meta: Dict with problem metadata
         api_key: OpenRouter API key for generating embedding
         problems_with_embeddings: List of problem dicts from embeddings file
-        embeddings: List of embedding vectors
+        index: SimilarityIndex over the reference embeddings
         k: Number of similar problems to return
+        cache: Optional EmbeddingCache for the query embedding
+        model: Embedding model the references were built with
 
     Returns:
-        List of k problem dicts (without embedding field) sorted by similarity
+        List of k problem dicts (without embedding field, with "similarity")
+        sorted by similarity
     """
     embedding_text = build_embedding_text(problem_meta)
-    query_embedding = generate_embedding(api_key, embedding_text)
+    query_embedding = embed_query(api_key, embedding_text, cache, model=model)
 
-    if not query_embedding:
+    if query_embedding is None or len(query_embedding) == 0:
         print("  [!] Could not generate embedding, skipping similarity search.")
         return []
 
-    similarities = []
-    for i, emb in enumerate(embeddings):
-        sim = cosine_similarity(query_embedding, emb)
-        similarities.append((sim, i))
+    return find_similar_batch(query_embedding, problems_with_embeddings, index, k)[0]
 
-    similarities.sort(reverse=True, key=lambda x: x[0])
 
-    results = []
-    for sim, idx in similarities[:k]:
-        problem = problems_with_embeddings[idx].copy()
-        problem.pop('embedding', None)
-        results.append(problem)
+def find_similar_batch(query_embeddings, problems_with_embeddings, index, k=5):
+    """
+    Find k most similar problems for many query embeddings in one matrix product.
+
+    Returns:
+        List (one entry per query) of k problem dicts (with "similarity")
+        sorted by similarity
+    """
+    indices, scores = index.search_batch(query_embeddings, k)
+    return [reference_results(problems_with_embeddings, row, row_scores) for row, row_scores in zip(indices, scores)]
+
+
+def fetch_api_json(url, endpoint, timeout):
+    """
+    GET a metadata API endpoint.
+
+    Returns:
+        The JSON payload, or None if the API answered 404 (unknown slug)
+
+    Raises:
+        requests.exceptions.RequestException or ValueError for transport
+        errors, server errors and unreadable responses
+    """
+    import requests
+    from core.http_client import get_client
+    try:
+        resp = get_client().get(url, endpoint=endpoint, timeout=timeout)
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return None
+        raise
+    return resp.json()
 
-    return results
+
+def is_not_found_payload(data):
+    """True for a successful response whose body says the slug does not exist."""
+    return not isinstance(data, dict) or bool(data.get("error") or data.get("errors"))
 
 
 def fetch_from_alfa_api(slug):
-    """Fetch problem metadata from Alfa API."""
+    """
+    Fetch problem metadata from Alfa API.
+
+    Returns:
+        Metadata dict, or None if the API does not know the slug (raises on
+        other failures, see fetch_api_json)
+    """
     url = f"https://alfa-leetcode-api.onrender.com/select/raw?titleSlug={slug}"
-    try:
-        resp = requests.get(url, timeout=60)
-        resp.raise_for_status()
-        data = resp.json()
-        return {
-            "title": data.get("questionTitle", slug),
-            "difficulty": data.get("difficulty", "Unknown"),
-            "topics": [t.get("name") for t in data.get("topicTags", [])],
-            "description": data.get("question", ""),
-            "hints": data.get("hints", []),
-        }
-    except Exception as e:
-        print(f"  [x] Failed to fetch from Alfa API: {e}")
+    data = fetch_api_json(url, "alfa-leetcode-api", 60)
+    if is_not_found_payload(data):
         return None
+    return {
+        "title": data.get("questionTitle", slug),
+        "difficulty": data.get("difficulty", "Unknown"),
+        "topics": [t.get("name") for t in data.get("topicTags", [])],
+        "description": data.get("question", ""),
+        "hints": data.get("hints", []),
+    }
 
 
 def fetch_from_leetcode_api(slug):
-    """Fetch problem metadata from LeetCode API as fallback."""
+    """
+    Fetch problem metadata from LeetCode API as fallback.
+
+    Returns:
+        Metadata dict, or None if the API does not know the slug (raises on
+        other failures, see fetch_api_json)
+    """
     url = f"https://leetcode-api-pied.vercel.app/problem/{slug}"
-    try:
-        resp = requests.get(url, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
-        return {
-            "title": data.get("questionTitle", slug),
-            "difficulty": data.get("difficulty", "Unknown"),
-            "topics": [t.get("name") for t in data.get("topicTags", [])],
-            "description": data.get("content", ""),
-            "hints": [],
-        }
-    except Exception as e:
-        print(f"  [x] Failed to fetch from LeetCode API: {e}")
+    data = fetch_api_json(url, "leetcode-api-pied", 30)
+    if is_not_found_payload(data):
         return None
+    return {
+        "title": data.get("questionTitle", slug),
+        "difficulty": data.get("difficulty", "Unknown"),
+        "topics": [t.get("name") for t in data.get("topicTags", [])],
+        "description": data.get("content", ""),
+        "hints": [],
+    }
 
 
-def fetch_problem_meta(slug, api_key=None):
+def fetch_problem_meta(slug, api_key=None, cache=None, refresh=False):
     """
     Fetch problem metadata, trying Alfa API first, then LeetCode API as fallback.
+
+    With a MetaCache, cached results (including cached misses) are returned
+    without touching the network unless refresh is set. Only definitive
+    misses (every API answered "not found") are cached as failures; timeouts,
+    connection and server errors are not, so the next run retries them.
     """
-    meta = fetch_from_alfa_api(slug)
-    if not meta and api_key:
-        meta = fetch_from_leetcode_api(slug)
+    if cache is not None and not refresh:
+        hit, meta = cache.get(slug)
+        if hit:
+            return meta
+    sources = [("Alfa API", fetch_from_alfa_api)]
+    if api_key:
+        sources.append(("LeetCode API", fetch_from_leetcode_api))
+
+    meta, errored = None, False
+    for name, fetch in sources:
+        try:
+            meta = fetch(slug)
+        except Exception as e:
+            print(f"  [x] Failed to fetch from {name}: {e}")
+            errored = True
+            continue
+        if meta:
+            break
+    if cache is not None and (meta or not errored):
+        cache.put(slug, meta)
     return meta
 
 
+def prefetch_problem_meta(slugs, api_key=None, cache=None, concurrency=8, refresh=False):
+    """
+    Resolve metadata for many slugs concurrently.
+
+    Returns:
+        Dict mapping slug -> metadata for every slug that could be resolved
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    slugs = list(slugs)
+    if not slugs:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        metas = pool.map(lambda slug: fetch_problem_meta(slug, api_key, cache=cache, refresh=refresh), slugs)
+        return {slug: meta for slug, meta in zip(slugs, metas) if meta}
+
+
 def get_taxonomy_files():
     """Return list of taxonomy JSON file paths."""
     return [
@@ -221,23 +624,3 @@ def get_taxonomy_files():
         DATA_DIR / "taxonomy_graph_mastery_v1.json",
         DATA_DIR / "taxonomy_graph_neetcode150.json"
     ]
-
-
-def collect_slugs_to_predict():
-    """Collect all slugs that need prediction from taxonomy files."""
-    slugs_to_predict = set()
-    for filepath in get_taxonomy_files():
-        if not filepath.exists():
-            continue
-        with open(filepath, 'r') as f:
-            taxonomy = json.load(f)
-        for topic in taxonomy:
-            for section in topic.get('sections', []):
-                def collect(problems):
-                    for prob in problems:
-                        if prob.get("is_predicted") is True or prob.get("rating") is None:
-                            slugs_to_predict.add(prob["slug"])
-                collect(section.get('problems', []))
-                for sub in section.get('subtopics', []):
-                    collect(sub.get('problems', []))
-    return slugs_to_predict
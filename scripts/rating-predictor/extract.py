@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Rebuild the taxonomy graph from the raw curriculum pages.
+
+Pages are parsed in a process pool (one page per task, see
+core/extraction.py) and merged in taxonomy_mapping.csv order, so the output
+does not depend on which worker finishes first. The existing graph is the
+curated source: its section titles, kept unmapped sections and translated
+descriptions are carried over (a description whose Chinese lines are no
+longer on the page keeps its translation and is flagged description_stale),
+as are ratings already applied to it (predictions). New sections get their
+English title from the CSV; problem titles and difficulty come from
+merged_problems.json (or the existing graph), contest ratings from
+zerotrac.json. A full extraction of unchanged pages reproduces the
+committed graph byte for byte.
+
+Runs are incremental: a manifest records the content hash of every page and
+mapping row. Only pages whose HTML or rows changed (plus any other page
+feeding the same topics) are re-extracted, and just their topics are
+patched into the existing graph; use --full to rebuild everything.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from core.extraction import load_routes, extract_page
+from core.taxonomy_index import file_sha256
+from core.utils import (
+    write_json_atomic,
+    load_merged_problems,
+    load_zerotrac,
+    DATA_DIR,
+    EXTRACTION_MANIFEST_PATH,
+    RAW_DATA_PATH,
+    ZEROTRAC_PATH,
+    RAW_PAGES_DIR,
+    TAXONOMY_MAPPING_PATH,
+)
+
+DEFAULT_OUTPUT = DATA_DIR / "taxonomy_graph_manual.json"
+
+MANIFEST_VERSION = 1
+
+# Health report targets (docs/plan.md)
+TARGET_JOIN_RATE = 95.0
+TARGET_CSV_COVERAGE = 100.0
+
+
+def pages_in_order(routes):
+    """Source pages with their routes, in CSV order of first appearance."""
+    pages = {}
+    for route in routes:
+        pages.setdefault(route.source_file, []).append(route)
+    return pages
+
+
+def extract_pages(pages, pages_dir, workers):
+    """
+    Parse every page, in parallel when workers > 1.
+
+    Returns:
+        List of extract_page results (None for missing pages), in pages order
+    """
+    jobs = [(pages_dir / name, page_routes) for name, page_routes in pages.items()]
+    results = [None] * len(jobs)
+    present = [i for i, (path, _) in enumerate(jobs) if path.exists()]
+    if min(workers, len(present)) <= 1:
+        for i in present:
+            results[i] = extract_page(*jobs[i])
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(present))) as pool:
+        futures = {i: pool.submit(extract_page, *jobs[i]) for i in present}
+        for i, future in futures.items():
+            results[i] = future.result()
+    return results
+
+
+def row_hash(route):
+    """Content hash of one mapping row (the deprecated default_labels column is ignored)."""
+    fields = [route.visual_group, route.topic, route.row_title, route.source_file, route.header_regex]
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def page_signatures(pages, pages_dir):
+    """
+    Current content hashes per page.
+
+    Returns:
+        Dict page name -> {"sha256": hash of the HTML (None if missing),
+        "rows": hashes of its mapping rows, in order}
+    """
+    signatures = {}
+    for name, page_routes in pages.items():
+        path = pages_dir / name
+        signatures[name] = {
+            "sha256": file_sha256(path) if path.exists() else None,
+            "rows": [row_hash(route) for route in page_routes],
+        }
+    return signatures
+
+
+def load_manifest(output, path=EXTRACTION_MANIFEST_PATH):
+    """The manifest of the last run into output, or None if there is no usable one."""
+    if not path.exists() or not output.exists():
+        return None
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("output") != str(output.resolve()):
+        return None
+    return manifest
+
+
+def save_manifest(output, pages, path=EXTRACTION_MANIFEST_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_json_atomic(path, {"version": MANIFEST_VERSION, "output": str(output.resolve()), "pages": pages}, indent=2)
+
+
+def plan_rebuild(pages, signatures, manifest):
+    """
+    Pick the pages to re-extract.
+
+    A page is dirty when its HTML or any of its mapping rows changed, or it
+    was added or removed. Every topic a dirty page fed (before or now) is
+    rebuilt, so all pages feeding those topics are re-extracted.
+
+    Returns:
+        (selected page names in pages order, dirty page names, topic ids to rebuild)
+    """
+    recorded = manifest["pages"]
+    dirty = [
+        name for name in pages
+        if name not in recorded or {k: recorded[name].get(k) for k in ("sha256", "rows")} != signatures[name]
+    ]
+    dirty += [name for name in recorded if name not in pages]
+
+    def topics_of(name):
+        current = {route.topic for route in pages.get(name, [])}
+        return current | set(recorded.get(name, {}).get("topics", []))
+
+    # Grow to a closure: a re-extracted page rebuilds all the topics it feeds
+    topics = set().union(*(topics_of(name) for name in dirty)) if dirty else set()
+    while True:
+        selected = [name for name in pages if name in dirty or topics_of(name) & topics]
+        grown = topics.union(*(topics_of(name) for name in selected))
+        if grown == topics:
+            return selected, dirty, topics
+        topics = grown
+
+
+def load_graph(path):
+    """Parsed graph file, or an empty list if it does not exist."""
+    if not path.exists():
+        return []
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def index_previous(taxonomy):
+    """
+    Index an existing graph for carrying values over.
+
+    Returns:
+        (nodes, problems): nodes keyed by (topic id, section title_zh,
+        subtopic title_zh or None), problems keyed by slug (first occurrence)
+    """
+    nodes, problems = {}, {}
+    for topic in taxonomy:
+        for section in topic.get('sections', []):
+            nodes[(topic['id'], section.get('title_zh'), None)] = section
+            for sub in section.get('subtopics', []):
+                nodes[(topic['id'], section.get('title_zh'), sub.get('title_zh'))] = sub
+            for sub in [section] + section.get('subtopics', []):
+                for prob in sub.get('problems', []):
+                    problems.setdefault(prob['slug'], prob)
+    return nodes, problems
+
+
+def load_ratings():
+    """Contest ratings by slug from zerotrac.json (empty if it is missing)."""
+    if not ZEROTRAC_PATH.exists():
+        print(f"  [!] {ZEROTRAC_PATH.name} not found, keeping the existing ratings only.")
+        return {}
+    return {entry['TitleSlug']: int(round(entry['Rating'])) for entry in load_zerotrac()}
+
+
+class GraphBuilder:
+    """Turns extracted pages into taxonomy topics and tallies the health report."""
+
+    def __init__(self, routes, previous_nodes, previous_problems, store, ratings):
+        self.routes = routes
+        self.previous_nodes = previous_nodes
+        self.previous_problems = previous_problems
+        self.store = store
+        self.ratings = ratings
+        self.topics = {}
+        self.page_topics = {}
+        self.stats = Counter()
+        self.difficulty = Counter()
+        self.tags = Counter()
+        self.slugs = set()
+        self.untranslated = 0
+        self.stale = 0
+
+    def problem_meta(self, slug):
+        """(title, difficulty) in English, or None if the problem is unknown."""
+        record = self.store.get(slug) if self.store is not None else None
+        if record and record.get('title'):
+            return record['title'], record.get('difficulty') or 'Unknown'
+        old = self.previous_problems.get(slug)
+        if old:
+            return old['title'], old['difficulty']
+        return None
+
+    def build_problems(self, extracted):
+        # Repeats within a row are kept: the curated graph lists them twice as well
+        problems, seen = [], set()
+        for raw in extracted:
+            slug = raw['slug']
+            self.stats['in_lists'] += 1
+            if slug in seen:
+                self.stats['duplicates'] += 1
+            seen.add(slug)
+            meta = self.problem_meta(slug)
+            old = self.previous_problems.get(slug, {})
+            problem_id = raw['id'] or old.get('id')
+            if meta is None or problem_id is None:
+                self.stats['dropped'] += 1
+                continue
+
+            if slug in self.ratings:
+                rating, is_predicted = self.ratings[slug], False
+                self.stats['contest_rated'] += 1
+            else:
+                rating, is_predicted = old.get('rating'), old.get('is_predicted') is True
+                self.stats['predicted' if is_predicted else 'unrated' if rating is None else 'kept_rating'] += 1
+
+            title, difficulty = meta
+            problems.append({
+                "id": problem_id,
+                "title": title,
+                "slug": slug,
+                "rating": rating,
+                "is_predicted": is_predicted,
+                "difficulty": difficulty,
+                "is_premium": raw['is_premium'],
+                "tags": raw['tags'],
+            })
+            self.slugs.add(slug)
+            self.difficulty[difficulty] += 1
+            self.tags.update(raw['tags'])
+        self.stats['extracted'] += len(problems)
+        return problems
+
+    def build_node(self, raw, key):
+        """
+        Section/subtopic fields shared by both levels.
+
+        Nodes of the existing graph keep their curated English title and
+        description. A curated description is a hand-picked subset of the
+        node's paragraphs: it is kept as long as every line is still on the
+        page, and otherwise keeps its translation but gets the page's current
+        text and a description_stale flag. New nodes get the CSV row title
+        and their paragraphs as an untranslated description_zh.
+        """
+        old = self.previous_nodes.get(key)
+        route = self.routes[raw['row_id']] if raw['row_id'] is not None else None
+        if old is not None:
+            title = old['title']
+        else:
+            title = route.row_title if route else raw['title_zh']
+        node = {"title": title, "title_zh": raw['title_zh']}
+
+        paragraphs = raw['paragraphs']
+        if old is not None and old.get('description_zh'):
+            node["description"] = old['description']
+            if all(line in paragraphs for line in old['description_zh'].split('\n')):
+                if old.get('description_stale'):
+                    self.stale += 1
+                    node["description_stale"] = True
+                node["description_zh"] = old['description_zh']
+                return node
+            self.stale += 1
+            node["description_stale"] = True
+        elif old is not None:
+            # Curated without a description: the page text is not shown
+            return node
+        # Paragraphs ending in a colon introduce tables/code blocks, which are not kept
+        description_zh = '\n'.join(p for p in paragraphs if not p.endswith(('：', ':')))
+        if description_zh:
+            node["description_zh"] = description_zh
+        return node
+
+    def count_untranslated(self, node):
+        if "description_zh" in node and "description" not in node:
+            self.untranslated += 1
+
+    def add_page(self, page_routes, result):
+        """Merge one page's sections into their topics."""
+        route = page_routes[0]
+        touched = self.page_topics.setdefault(result['page'], set())
+        for raw in result['sections']:
+            if raw['row_id'] is not None:
+                route = self.routes[raw['row_id']]
+            touched.add(route.topic)
+            topic = self.topics.setdefault(route.topic, {
+                "id": route.topic,
+                "group": route.visual_group,
+                "title": ' '.join(word.capitalize() for word in route.topic.split('-')),
+                "sections": [],
+            })
+
+            key = (route.topic, raw['title_zh'], None)
+            section = self.build_node(raw, key)
+            subtopics = []
+            for raw_sub in raw['subtopics']:
+                sub_key = (route.topic, raw['title_zh'], raw_sub['title_zh'])
+                sub = self.build_node(raw_sub, sub_key)
+                sub["problems"] = self.build_problems(raw_sub['problems'])
+                if sub["problems"] or raw_sub['row_id'] is not None or sub_key in self.previous_nodes:
+                    subtopics.append(sub)
+                    self.count_untranslated(sub)
+            section["subtopics"] = subtopics
+            section["problems"] = self.build_problems(raw['problems'])
+
+            # Unmapped headers (prefaces, footers) are kept only if they hold
+            # problems or are already in the graph
+            if (raw['row_id'] is not None or key in self.previous_nodes
+                    or section["problems"] or any(s["problems"] for s in subtopics)):
+                topic["sections"].append(section)
+                self.count_untranslated(section)
+
+    def graph(self, previous=None, rebuilt=None):
+        """
+        Topics sorted by id, as in the existing graph files.
+
+        With previous and rebuilt, the topics of previous outside rebuilt
+        are kept as they are and only the rebuilt ones are replaced.
+        """
+        topics = dict(self.topics)
+        if previous is not None:
+            for topic in previous:
+                if topic['id'] not in rebuilt and topic['id'] not in topics:
+                    topics[topic['id']] = topic
+        return [topics[key] for key in sorted(topics)]
+
+
+def print_health_report(builder, results, pages, routes, elapsed, workers):
+    """Print the extraction-rate health report."""
+    stats = builder.stats
+    links = sum(r['links'] for r in results if r)
+    matched = {row_id for r in results if r for row_id in r['matched']}
+    unmapped = sum(len(r['unmapped']) for r in results if r)
+    parsed = sum(1 for r in results if r)
+
+    def percent(part, whole):
+        return 100.0 * part / whole if whole else 0.0
+
+    print()
+    print("Extraction health report")
+    print("=" * 40)
+    print(f"Pages: {parsed}/{len(pages)} parsed in {elapsed:.2f}s ({workers} worker{'s' if workers != 1 else ''})")
+    for name, result in zip(pages, results):
+        if result is None:
+            print(f"  [x] Missing page: {name}")
+    print(f"Problem links (ground truth): {links}")
+    print(f"  In list items: {stats['in_lists']} ({links - stats['in_lists']} supplementary links elsewhere)")
+    print(f"  Repeated within a row: {stats['duplicates']}")
+    print(f"  Dropped (no English metadata): {stats['dropped']}")
+    print(f"Problem occurrences: {stats['extracted']}")
+    print(f"Extraction rate: {percent(stats['extracted'], links):.1f}% ({stats['extracted']}/{links})")
+    print(f"Unique problems: {len(builder.slugs)}")
+
+    joinable = stats['in_lists']
+    join_rate = percent(stats['extracted'], joinable)
+    marker = '[+]' if join_rate > TARGET_JOIN_RATE else '[!]'
+    print(f"{marker} LCID join rate: {join_rate:.1f}% (target >{TARGET_JOIN_RATE:.0f}%)")
+
+    coverage = percent(len(matched), len(routes))
+    marker = '[+]' if coverage >= TARGET_CSV_COVERAGE else '[!]'
+    print(f"{marker} CSV coverage: {coverage:.1f}% ({len(matched)}/{len(routes)} rows matched)")
+    for route in routes:
+        if route.row_id not in matched:
+            print(f"  [-] {route.source_file}: {route.row_title} ({route.header_regex})")
+    print(f"Unmapped headers: {unmapped} (kept when they hold problems or are already in the graph)")
+    print(f"Untranslated descriptions: {builder.untranslated} new, {builder.stale} stale")
+
+    print("Difficulty: " + ", ".join(f"{d} {builder.difficulty[d]}" for d in sorted(builder.difficulty)))
+    print("Labels: " + (", ".join(f"{t} {n}" for t, n in builder.tags.most_common()) or "none"))
+    print(f"Ratings: {stats['contest_rated']} contest, {stats['predicted']} predicted, "
+          f"{stats['kept_rating']} kept, {stats['unrated']} unrated")
+
+
+def cmd_extract(args):
+    """Extract the raw pages and merge them into the taxonomy graph."""
+    routes = load_routes(args.mapping)
+    pages = pages_in_order(routes)
+    workers = args.workers if args.workers is not None else (os.cpu_count() or 1)
+    print(f"Loaded {len(routes)} mapping rows over {len(pages)} pages from {args.mapping.name}.")
+
+    signatures = page_signatures(pages, args.pages_dir)
+    manifest = None if args.full else load_manifest(args.output)
+    rebuilt = None
+    if manifest is not None:
+        selected, dirty, rebuilt = plan_rebuild(pages, signatures, manifest)
+        if not dirty:
+            print("No raw page or mapping row changed since the last extraction. Nothing to do.")
+            return
+        print(f"Changed pages: {', '.join(dirty)}")
+        print(f"Re-extracting {len(selected)}/{len(pages)} pages for topics: {', '.join(sorted(rebuilt))}")
+        pages = {name: pages[name] for name in selected}
+    else:
+        print("Full extraction (no manifest for this output, or --full).")
+
+    start = time.perf_counter()
+    results = extract_pages(pages, args.pages_dir, workers)
+    elapsed = time.perf_counter() - start
+
+    store = None
+    if RAW_DATA_PATH.exists():
+        store = load_merged_problems()
+    else:
+        print(f"  [!] {RAW_DATA_PATH.name} not found, using titles from the existing graph only.")
+    previous = load_graph(args.output)
+    previous_nodes, previous_problems = index_previous(previous)
+    builder = GraphBuilder(routes, previous_nodes, previous_problems, store, load_ratings())
+    for page_routes, result in zip(pages.values(), results):
+        if result is not None:
+            builder.add_page(page_routes, result)
+    graph = builder.graph(previous, rebuilt) if rebuilt is not None else builder.graph()
+
+    page_routes = [route for page in pages.values() for route in page]
+    print_health_report(builder, results, list(pages), page_routes, elapsed, workers)
+    print()
+
+    content = json.dumps(graph, indent=2)
+    if args.output.exists() and args.output.read_text() == content:
+        print(f"No changes, left {args.output.name} untouched.")
+    elif args.dry_run:
+        print(f"Dry run: {args.output.name} would be rewritten. No files were written.")
+    else:
+        write_json_atomic(args.output, graph, indent=2)
+        print(f"Saved {len(graph)} topics to: {args.output}")
+
+    if not args.dry_run:
+        recorded = dict(manifest["pages"]) if manifest is not None else {}
+        for name in list(recorded):
+            if name not in signatures:
+                del recorded[name]
+        for name, result in zip(pages, results):
+            if result is None:
+                recorded.pop(name, None)
+            else:
+                recorded[name] = dict(signatures[name], topics=sorted(builder.page_topics.get(name, ())))
+        save_manifest(args.output, recorded)
+
+
+def add_extract_arguments(parser):
+    """Register the options of the extract command on a parser."""
+    parser.add_argument("--pages-dir", type=Path, default=RAW_PAGES_DIR, help="Directory of raw HTML pages (default: raw_pages/full-practice)")
+    parser.add_argument("--mapping", type=Path, default=TAXONOMY_MAPPING_PATH, help="Taxonomy mapping CSV (default: src/raw-data/taxonomy_mapping.csv)")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help=f"Graph file to merge into (default: {DEFAULT_OUTPUT.name})")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count; 1 parses in-process)")
+    parser.add_argument("--full", action="store_true", help="Re-extract every page instead of only the changed ones")
+    parser.add_argument("--dry-run", action="store_true", help="Print the health report without writing the graph")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the taxonomy graph from the raw pages")
+    add_extract_arguments(parser)
+    parser.set_defaults(func=cmd_extract)
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
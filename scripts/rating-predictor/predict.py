@@ -6,54 +6,109 @@ Prediction commands: generate predictions with similarity search.
 import argparse
 import json
 import re
+import threading
 import requests
-import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from core.utils import (
     get_api_key,
     load_merged_problems,
     load_predictions,
-    save_predictions,
-    load_embeddings,
+    compact_predictions,
+    PredictionJournal,
+    build_embedding_text,
+    text_hash,
+    generate_embeddings_batched,
     find_similar_problems,
+    find_similar_batch,
     fetch_problem_meta,
-    collect_slugs_to_predict,
+    prefetch_problem_meta,
+    LOCAL_EMBEDDINGS_MODEL,
     DEFAULT_PREDICT_MODEL,
+    openrouter_url,
+    DATASET_DB_PATH,
+    NEIGHBOURS_PATH,
+)
+from core.ann import load_similarity_index
+from core.taxonomy_index import collect_slugs_to_predict
+from core.store import load_references
+from core.neighbours import load_neighbour_table, save_neighbour_table, current_entry
+from core.cache import EmbeddingCache, MetaCache, ResponseCache, CompactCache
+from core.compaction import PromptCompactor, DEFAULT_TOKEN_BUDGET
+from core.dataset import Dataset, dataset_enabled
+from core.ratelimit import RateLimiter
+from core.http_client import get_client
+from core.hedge import hedged_call
+from core.knn import knn_estimate, KNN_ANNOTATOR, DEFAULT_MAX_SPREAD, DEFAULT_MIN_SIMILARITY
+from core.prompts import (
+    build_user_prompt,
+    build_batch_prompt,
+    within_bounds,
+    SYSTEM_PROMPT,
+    BATCH_SYSTEM_PROMPT,
 )
-from core.prompts import build_user_prompt, SYSTEM_PROMPT
-
-
-def call_openrouter(api_key, user_prompt, model_name):
-    """Call OpenRouter API for rating prediction."""
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
 
-    payload = {
+# Hedge delay used until enough chat calls have been timed to learn a percentile
+HEDGE_DEFAULT_DELAY = 30.0
+
+
+def rating_payload(user_prompt, model_name, system_prompt=SYSTEM_PROMPT, web_search=True):
+    """
+    Chat completion request body for one rating prediction (or one batch).
+
+    web_search enables OpenRouter's web plugin; backtests turn it off, since
+    the searched sites publish the very ratings being predicted.
+    """
+    plugins = []
+    if web_search:
+        plugins.append({
+            "id": "web",
+            "max_results": 3,
+            "include_domains": ["leetcode.com", "leetcode.ca", "walkccc.me", "neetcode.io", "github.com"]
+        })
+    return {
         "model": model_name,
         "temperature": 0.3,
         "response_format": {"type": "json_object"},
-        "plugins": [
-            {
-                "id": "web",
-                "max_results": 3,
-                "include_domains": ["leetcode.com", "leetcode.ca", "walkccc.me", "neetcode.io", "github.com"]
-            }
-        ],
+        "plugins": plugins,
         "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
         ],
+        "usage": {"include": True},
     }
 
+
+def is_valid_rating(result):
+    return isinstance(result, dict) and "predicted_rating" in result
+
+
+def is_valid_batch(result):
+    return isinstance(result, dict) and isinstance(result.get("predictions"), list)
+
+
+def request_rating(api_key, payload, limiter=None):
+    """
+    Send one rating request and parse the JSON answer.
+
+    Returns:
+        Parsed response dict, or None on failure
+    """
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+
+    content = ''
     try:
-        resp = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
+        resp = get_client().post(
+            openrouter_url("/chat/completions"),
+            endpoint="openrouter.chat",
             headers=headers,
             data=json.dumps(payload),
-            timeout=120
+            timeout=120,
+            limiter=limiter,
         )
-        resp.raise_for_status()
         data = resp.json()
         content = data["choices"][0]["message"]["content"]
 
@@ -61,7 +116,11 @@ def call_openrouter(api_key, user_prompt, model_name):
         json_match = re.search(r'```json\s*(.*?)\s*```', content, re.DOTALL)
         if json_match:
             content = json_match.group(1)
-        return json.loads(content)
+        result = json.loads(content)
+        if isinstance(result, dict):
+            # Token counts and cost, for reporting (never cached)
+            result['_usage'] = data.get('usage')
+        return result
     except requests.exceptions.HTTPError as e:
         print(f"  [x] HTTP Error: {e}")
         print(f"      Response: {e.response.text[:500] if hasattr(e, 'response') else ''}")
@@ -74,25 +133,278 @@ def call_openrouter(api_key, user_prompt, model_name):
         return None
 
 
-def cmd_predict(args):
-    """Generate predictions for problems needing ratings."""
-    api_key = get_api_key()
-    merged_lookup = load_merged_problems()
-    predictions = load_predictions()
+def hedge_delay(percentile):
+    """Seconds to wait before hedging: the learned latency percentile, or a fixed default."""
+    delay = get_client().latency_percentile("openrouter.chat", percentile)
+    return HEDGE_DEFAULT_DELAY if delay is None else delay
+
+
+def call_openrouter(api_key, user_prompt, model_name, limiter=None, cache=None, refresh=False, hedge=None,
+                    system_prompt=SYSTEM_PROMPT, is_valid=is_valid_rating, web_search=True):
+    """
+    Call OpenRouter API for rating prediction.
+
+    Goes through the shared HTTP client, which retries transient failures. If
+    a RateLimiter is given, every attempt first takes a token from it, and
+    HTTP 429 responses slow the limiter down. If a ResponseCache is given, an
+    identical earlier request is answered from it (unless refresh is set) and
+    every valid answer is stored in it.
+
+    Args:
+        hedge: Optional {"percentile": ..., "fallback_model": ...}; if the call
+            is slower than that percentile of recent calls, a duplicate is
+            sent (to the fallback model if set) and the first valid answer wins
+        system_prompt: SYSTEM_PROMPT, or BATCH_SYSTEM_PROMPT for batched requests
+        is_valid: Predicate for an acceptable parsed answer
+        web_search: Let the model use the web plugin
+
+    Returns:
+        (result, model): parsed response (None on failure) and the model
+        that produced it
+    """
+    payload = rating_payload(user_prompt, model_name, system_prompt, web_search)
+
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key(model_name, payload["temperature"], system_prompt, user_prompt, payload["plugins"])
+        cached = None if refresh else cache.get(cache_key)
+        if cached is not None:
+            cached['_cached'] = True
+            return cached, model_name
+
+    model = model_name
+    if hedge is None:
+        result = request_rating(api_key, payload, limiter)
+    else:
+        hedge_model = hedge.get('fallback_model') or model_name
+        winner, result = hedged_call(
+            lambda: request_rating(api_key, payload, limiter),
+            lambda: request_rating(api_key, rating_payload(user_prompt, hedge_model, system_prompt, web_search), limiter),
+            hedge_delay(hedge['percentile']),
+            is_valid,
+        )
+        if winner == 1:
+            model = hedge_model
+            result['_hedged'] = True
+            if cache is not None:
+                cache_key = cache.key(model, payload["temperature"], system_prompt, user_prompt, payload["plugins"])
 
-    # Load embeddings for similarity search
-    problems_with_embeddings = None
-    embeddings = None
-    if not args.no_similar:
-        print("Loading embeddings for similarity search...")
-        problems_with_embeddings, embeddings = load_embeddings()
-        if problems_with_embeddings:
-            print(f"Loaded {len(problems_with_embeddings)} problems with embeddings.")
+    if cache_key is not None and is_valid(result):
+        cache.put(cache_key, model, {k: v for k, v in result.items() if not k.startswith('_')})
+    return result, model
+
+
+def predict_slug(slug, ctx):
+    """
+    Run the full pipeline for one slug (worker thread).
+
+    Returns:
+        Prediction record dict, or None on failure
+    """
+    meta = lookup_meta(slug, ctx)
+
+    if not meta:
+        print(f"  [-] {slug}: could not find metadata, skipping.")
+        return None
+
+    similar_problems = find_references(slug, meta, ctx)
+    if ctx['mode'] != 'llm':
+        record = local_estimate(slug, meta, similar_problems, ctx)
+        if record or ctx['mode'] == 'knn':
+            return record
+
+    return rate_prompt(slug, build_slug_prompt(slug, meta, similar_problems, ctx), ctx)
+
+
+def lookup_meta(slug, ctx):
+    """Metadata for slug: merged_problems.json, the prefetch, or a fetch on demand."""
+    meta = ctx['merged_lookup'].get(slug) or ctx['fetched_meta'].get(slug)
+    if not meta and slug not in ctx['prefetched']:
+        # Past the prefetched window (-k runs that skipped failed slugs)
+        meta = fetch_problem_meta(slug, ctx['api_key'], cache=ctx['meta_cache'], refresh=ctx['refresh_meta'])
+    return meta
+
+
+def find_references(slug, meta, ctx):
+    """Similar reference problems for one slug (with similarity scores), or None."""
+    # Precomputed table first, live search otherwise
+    similar_problems = table_neighbours(slug, meta, ctx)
+    if similar_problems is None and ctx['problems_with_embeddings']:
+        similar_problems = find_similar_problems(
+            meta, ctx['api_key'], ctx['problems_with_embeddings'], search_index(ctx), k=5,
+            cache=ctx['embedding_cache'], model=ctx['embeddings_model']
+        )
+    if similar_problems:
+        print(f"  [*] {slug}: found {len(similar_problems)} similar reference problems")
+    return similar_problems
+
+
+def search_index(ctx):
+    """
+    Similarity index for live search, loaded on first use: slugs fetched on
+    demand may need it even when the neighbour table covered the rest.
+    """
+    with ctx['index_lock']:
+        if ctx['index'] is None:
+            ctx['index'] = load_similarity_index(ctx['embeddings'], nprobe=ctx['nprobe'], exact=ctx['exact'])
+            ctx['embedding_cache'] = EmbeddingCache()
+            print(f"Loaded {len(ctx['problems_with_embeddings'])} problems with embeddings ({type(ctx['index']).__name__}).")
+    return ctx['index']
+
+
+def local_estimate(slug, meta, similar_problems, ctx):
+    """
+    kNN prediction for --mode knn/cascade.
+
+    Returns:
+        Prediction record, or None when there is no usable estimate (knn) or
+        the estimate is not trusted and the LLM should decide (cascade)
+    """
+    estimate = knn_estimate(similar_problems, meta.get('difficulty'))
+    if estimate is None:
+        print(f"  [!] {slug}: no reference problems for a kNN estimate.")
+        return None
+    if ctx['mode'] == 'cascade' and not estimate.confident(ctx['max_spread'], ctx['min_similarity']):
+        print(f"  [*] {slug}: kNN unsure (spread {estimate.spread:.0f}, "
+              f"top similarity {estimate.top_similarity:.2f}), asking the LLM")
+        return None
+    return {
+        "predicted_rating": estimate.rating,
+        "rationale": estimate.rationale(),
+        "annotator": KNN_ANNOTATOR,
+    }
+
+
+def build_slug_prompt(slug, meta, similar_problems, ctx):
+    """User prompt for one slug, with similar reference problems for context."""
+    if ctx['compactor'] is not None:
+        return ctx['compactor'].build_prompt(slug, meta, similar_problems)
+    return build_user_prompt(meta, similar_problems)
+
+
+def rate_prompt(slug, user_prompt, ctx):
+    """
+    Ask the model for one slug's rating.
+
+    Returns:
+        Prediction record dict, or None on failure
+    """
+    result, model = call_openrouter(
+        ctx['api_key'], user_prompt, ctx['model'], limiter=ctx['limiter'],
+        cache=ctx['response_cache'], refresh=ctx['refresh_responses'], hedge=ctx['hedge'],
+    )
+    if not is_valid_rating(result):
+        print(f"  [x] {slug}: invalid response format.")
+        return None
+    if result.get('_cached'):
+        print(f"  [*] {slug}: answered from the response cache")
+    if result.get('_hedged'):
+        print(f"  [*] {slug}: hedged request to {model} answered first")
+
+    return {
+        "predicted_rating": int(result["predicted_rating"]),
+        "rationale": result.get('rationale', ''),
+        "annotator": model,
+    }
+
+
+def predict_batch(slugs, ctx):
+    """
+    Predict several slugs with one batched request (worker thread).
+
+    Every returned item is validated (integer rating inside its difficulty
+    bounds); slugs whose item is missing or invalid fall back to a
+    single-problem request.
+
+    Returns:
+        List of (slug, record or None)
+    """
+    prompts = {}
+    results = []
+    for slug in slugs:
+        meta = lookup_meta(slug, ctx)
+        if not meta:
+            print(f"  [-] {slug}: could not find metadata, skipping.")
+            results.append((slug, None))
+            continue
+        similar_problems = find_references(slug, meta, ctx)
+        if ctx['mode'] != 'llm':
+            # Slugs the kNN estimate settles never reach the batch
+            record = local_estimate(slug, meta, similar_problems, ctx)
+            if record or ctx['mode'] == 'knn':
+                results.append((slug, record))
+                continue
+        prompts[slug] = (meta, build_slug_prompt(slug, meta, similar_problems, ctx))
+
+    if len(prompts) == 1:
+        slug, (_, user_prompt) = next(iter(prompts.items()))
+        return results + [(slug, rate_prompt(slug, user_prompt, ctx))]
+
+    items, model = {}, ctx['model']
+    if prompts:
+        result, model = call_openrouter(
+            ctx['api_key'], build_batch_prompt([(slug, p) for slug, (_, p) in prompts.items()]), ctx['model'],
+            limiter=ctx['limiter'], cache=ctx['response_cache'], refresh=ctx['refresh_responses'], hedge=ctx['hedge'],
+            system_prompt=BATCH_SYSTEM_PROMPT, is_valid=is_valid_batch,
+        )
+        if is_valid_batch(result):
+            items = {item.get('slug'): item for item in result['predictions'] if isinstance(item, dict)}
         else:
-            print("  [!] Could not load embeddings, continuing without similarity search.")
-            args.no_similar = True
+            print(f"  [x] Batch of {len(prompts)}: invalid response format, falling back to single requests.")
+
+    for slug, (meta, user_prompt) in prompts.items():
+        item = items.get(slug)
+        try:
+            rating = int(item['predicted_rating'])
+        except (TypeError, KeyError, ValueError):
+            rating = None
+        if rating is not None and within_bounds(meta.get('difficulty'), rating):
+            results.append((slug, {
+                "predicted_rating": rating,
+                "rationale": item.get('rationale', ''),
+                "annotator": model,
+            }))
+        else:
+            if items:
+                print(f"  [!] {slug}: batch answer missing or out of bounds, retrying alone.")
+            results.append((slug, rate_prompt(slug, user_prompt, ctx)))
+    return results
+
+
+def predict_unit(slugs, ctx):
+    """Worker entry point: one slug, or a batch when --batch-size > 1."""
+    if len(slugs) == 1:
+        return [(slugs[0], predict_slug(slugs[0], ctx))]
+    return predict_batch(slugs, ctx)
+
+
+def table_neighbours(slug, meta, ctx):
+    """
+    Reference problems for slug from the neighbour table.
+
+    Returns:
+        List of problem dicts, or None if the table has no current entry for slug
+    """
+    entry = current_entry(ctx['neighbours'], slug, meta)
+    if entry is None:
+        return None
+    references = ctx['references']
+    return [
+        dict(references[ref], similarity=score)
+        for ref, score in entry['neighbours'] if ref in references
+    ]
+
+
+def needs_api_key(mode, embeddings_model):
+    """
+    Whether a run talks to OpenRouter: every mode but knn calls the LLM,
+    and query embeddings are remote unless the store uses the local embedder.
+    """
+    return mode != 'knn' or (embeddings_model is not None and embeddings_model != LOCAL_EMBEDDINGS_MODEL)
+
 
-    # Get slugs to predict
+def select_pending(args, predictions):
+    """Slugs this run should predict, in a stable order."""
     if args.slug:
         slugs_to_predict = {args.slug}
     else:
@@ -101,93 +413,328 @@ def cmd_predict(args):
     print(f"Found {len(slugs_to_predict)} unique problems that require predictions.")
     if args.force:
         print(f"Force mode: will regenerate all {len(slugs_to_predict)} predictions.")
-    print()
+    return [slug for slug in sorted(slugs_to_predict) if args.force or slug not in predictions]
 
-    # Predict
-    new_predictions = 0
-    for slug in slugs_to_predict:
-        if not args.force and slug in predictions:
-            continue
 
-        print(f"Predicting rating for: {slug}")
+def open_meta_cache(dataset):
+    """Metadata cache: the dataset's problem_meta table when enabled, else the cache file."""
+    return MetaCache(DATASET_DB_PATH) if dataset else MetaCache()
 
-        meta = merged_lookup.get(slug)
-        if not meta:
-            meta = fetch_problem_meta(slug, api_key)
 
-        if not meta:
-            print("  [-] Could not find metadata, skipping.")
-            continue
+def resolve_metadata(slugs, merged_lookup, api_key, args, meta_cache):
+    """
+    Fetch metadata missing from merged_problems.json up front, so later
+    stages never block on the slow third-party APIs.
 
-        # Find similar problems for context
-        similar_problems = None
-        if not args.no_similar and problems_with_embeddings and embeddings:
-            similar_problems = find_similar_problems(meta, api_key, problems_with_embeddings, embeddings, k=5)
-            if similar_problems:
-                print(f"  [*] Found {len(similar_problems)} similar reference problems")
+    Args:
+        slugs: The slugs this run will process (not every pending slug)
 
-        user_prompt = build_user_prompt(meta, similar_problems)
+    Returns:
+        Dict slug -> metadata for the fetched slugs
+    """
+    to_fetch = [slug for slug in slugs if not merged_lookup.get(slug)]
+    fetched_meta = {}
+    if to_fetch:
+        print(f"Prefetching metadata for {len(to_fetch)} problems not in merged_problems.json...")
+        fetched_meta = prefetch_problem_meta(
+            to_fetch, api_key, cache=meta_cache, concurrency=args.meta_concurrency, refresh=args.refresh_meta
+        )
+        print(f"Resolved metadata for {len(fetched_meta)}/{len(to_fetch)} problems.")
+        print()
+    return fetched_meta
+
+
+def embed_query_texts(api_key, texts, model, concurrency=1):
+    """
+    Embed many query texts in bulk: the local backend, or cache hits first
+    and multi-input requests for the rest.
+
+    Returns:
+        Dict text -> vector
+    """
+    unique_texts = list(dict.fromkeys(texts))
+    if model == LOCAL_EMBEDDINGS_MODEL:
+        from core.local_embedder import get_local_embedder
+        return dict(zip(unique_texts, get_local_embedder().embed(unique_texts)))
+
+    cache = EmbeddingCache()
+    vectors = cache.get_many(model, unique_texts)
+    missing = [text for text in unique_texts if text not in vectors]
+    print(f"Query embeddings: {len(unique_texts) - len(missing)} cached, {len(missing)} to generate.")
+    if missing:
+        generated = generate_embeddings_batched(
+            api_key, missing, model=model, concurrency=max(1, concurrency),
+            on_batch=lambda batch, batch_vectors: cache.put_many(model, batch, batch_vectors),
+        )
+        vectors.update(zip(missing, generated))
+    cache.evict()
+    return vectors
 
-        try:
-            time.sleep(0.1)
-            result = call_openrouter(api_key, user_prompt, args.model)
-            if result and "predicted_rating" in result:
-                new_rating = int(result["predicted_rating"])
-                rationale = result.get('rationale', '')
-                print(f"  [+] Predicted: {new_rating} | Rationale: {rationale}")
-
-                predictions[slug] = {
-                    "predicted_rating": new_rating,
-                    "rationale": rationale,
-                    "annotator": args.model
-                }
-                new_predictions += 1
-
-                # Write to disk after every successful prediction
-                save_predictions(predictions)
-
-                if not args.all and new_predictions >= args.k:
-                    print(f"\n[!] Reached limit of {args.k} prediction(s). Stopping early.")
-                    break
-            else:
-                print("  [x] Invalid response format.")
-        except Exception as e:
-            print(f"  [x] API Error: {e}")
-
-        if not args.all and new_predictions >= args.k:
-            break
 
-    print()
-    print(f"Finished. Made {new_predictions} new predictions.")
+def cmd_prepare(args):
+    """
+    Precompute the neighbour table for every pending slug.
 
+    Metadata and query embeddings are resolved in bulk and all slugs are
+    searched in one batched pass, so the prediction stage only reads the
+    table.
+    """
+    merged_lookup = load_merged_problems()
+    predictions = load_predictions()
 
-def cmd_list(args):
-    """List all predictions."""
+    print("Loading embeddings for similarity search...")
+    problems_with_embeddings, embeddings, model = load_references()
+    if not problems_with_embeddings:
+        print("[x] No reference embeddings. Run setup embeddings first.")
+        return
+    api_key = get_api_key() if needs_api_key('knn', model) else None
+    index = load_similarity_index(embeddings, nprobe=args.nprobe, exact=args.exact)
+    print(f"Loaded {len(problems_with_embeddings)} problems with embeddings ({type(index).__name__}).")
+
+    pending = select_pending(args, predictions)
+    dataset = Dataset() if dataset_enabled() else None
+    fetched_meta = resolve_metadata(pending, merged_lookup, api_key, args, open_meta_cache(dataset))
+
+    texts = {}
+    for slug in pending:
+        meta = merged_lookup.get(slug) or fetched_meta.get(slug)
+        if meta:
+            texts[slug] = build_embedding_text(meta)
+        else:
+            print(f"  [-] {slug}: could not find metadata, skipping.")
+    if not texts:
+        print("Nothing to prepare.")
+        return
+
+    vectors = embed_query_texts(api_key, texts.values(), model, concurrency=args.concurrency)
+
+    slugs = list(texts)
+    k = 5
+    queries = np.asarray([vectors[texts[slug]] for slug in slugs], dtype=np.float32)
+    similar = find_similar_batch(queries, problems_with_embeddings, index, k)
+
+    table = load_neighbour_table() or {}
+    for slug, refs in zip(slugs, similar):
+        table[slug] = {
+            "text_hash": text_hash(texts[slug]),
+            "neighbours": [[ref['problem_slug'], round(ref['similarity'], 6)] for ref in refs],
+        }
+    save_neighbour_table(table, k, model)
+    print(f"Wrote neighbours for {len(slugs)} problems to {NEIGHBOURS_PATH.name} ({len(table)} total).")
+
+
+def cmd_predict(args):
+    """Generate predictions for problems needing ratings."""
+    if args.stage == 'prepare':
+        cmd_prepare(args)
+        return
+    if args.mode != 'llm' and args.no_similar:
+        print(f"[x] --mode {args.mode} needs similarity search; drop --no-similar.")
+        return
+
+    # Load embeddings for similarity search. With a current neighbour table
+    # (predict prepare) only the reference metadata is needed and the index
+    # is never built.
+    problems_with_embeddings = None
+    embeddings = None
+    embeddings_model = None
+    if not args.no_similar:
+        print("Loading embeddings for similarity search...")
+        problems_with_embeddings, embeddings, embeddings_model = load_references()
+        if not problems_with_embeddings:
+            print("  [!] Could not load embeddings, continuing without similarity search.")
+            args.no_similar = True
+
+    api_key = get_api_key() if needs_api_key(args.mode, embeddings_model) else None
+    merged_lookup = load_merged_problems()
     predictions = load_predictions()
-    print(f"Total predictions: {len(predictions)}")
+
+    pending = select_pending(args, predictions)
+    print(f"Concurrency: {args.concurrency}, rate limit: {args.rate} req/s"
+          + (f", {args.batch_size} problems per request" if args.batch_size > 1 else ""))
+    if args.mode != 'llm':
+        print(f"Mode: {args.mode}" + (f" (LLM when spread > {args.max_spread:g} or top similarity < {args.min_similarity:g})"
+                                      if args.mode == 'cascade' else ""))
+    if args.hedge:
+        print(f"Hedging: after p{args.hedge_percentile:g} latency, duplicate to {args.fallback_model or args.model}")
+    print()
+
+    dataset = Dataset() if dataset_enabled() else None
+    limit = None if args.all else args.k
+    # Only the first `limit` slugs are prefetched; the rest are fetched on
+    # demand if failures push the run past them
+    prefetched = pending if limit is None else pending[:limit]
+    meta_cache = open_meta_cache(dataset)
+    fetched_meta = resolve_metadata(prefetched, merged_lookup, api_key, args, meta_cache)
+
+    references = {}
+    neighbours = None
+    uncovered = []
+    if problems_with_embeddings:
+        references = {p['problem_slug']: p for p in problems_with_embeddings}
+        neighbours = load_neighbour_table()
+        # Slugs without a current entry (missing or stale) need live search
+        pending_meta = {slug: merged_lookup.get(slug) or fetched_meta.get(slug) for slug in pending}
+        uncovered = [
+            slug for slug, meta in pending_meta.items()
+            if meta and current_entry(neighbours, slug, meta) is None
+        ]
+        if neighbours is not None:
+            covered = sum(1 for meta in pending_meta.values() if meta) - len(uncovered)
+            print(f"Neighbour table covers {covered}/{len(pending)} pending problems.")
+
+    # kNN-only runs never call the LLM, so they open no response/compaction caches
+    uses_llm = args.mode != 'knn'
+    response_cache = ResponseCache() if uses_llm and not args.no_response_cache else None
+    if response_cache is not None and args.clear_response_cache:
+        print(f"Cleared {response_cache.invalidate(args.model)} cached responses for {args.model}.")
+
+    ctx = {
+        'api_key': api_key,
+        'merged_lookup': merged_lookup,
+        'fetched_meta': fetched_meta,
+        'prefetched': set(prefetched),
+        'meta_cache': meta_cache,
+        'refresh_meta': args.refresh_meta,
+        'problems_with_embeddings': problems_with_embeddings,
+        'references': references,
+        'neighbours': neighbours,
+        'embeddings': embeddings,
+        'index': None,
+        'index_lock': threading.Lock(),
+        'nprobe': args.nprobe,
+        'exact': args.exact,
+        'embedding_cache': None,
+        'embeddings_model': embeddings_model,
+        'model': args.model,
+        'limiter': RateLimiter(args.rate),
+        'response_cache': response_cache,
+        'refresh_responses': args.refresh_responses,
+        'hedge': {"percentile": args.hedge_percentile, "fallback_model": args.fallback_model} if args.hedge else None,
+        'compactor': PromptCompactor(args.token_budget, CompactCache()) if uses_llm and not args.no_compact else None,
+        'mode': args.mode,
+        'max_spread': args.max_spread,
+        'min_similarity': args.min_similarity,
+    }
+
+    if uncovered:
+        search_index(ctx)
+
+    # Workers run the network-bound pipeline; this thread is the only writer.
+    new_predictions = 0
+    local_predictions = 0
+    in_flight = {}
+    queue = iter(pending)
+    batch_size = max(1, args.batch_size)
+    with PredictionJournal() as journal, ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        def refill():
+            while len(in_flight) < max(1, args.concurrency):
+                size = batch_size
+                if limit is not None:
+                    size = min(size, limit - new_predictions - sum(len(unit) for unit in in_flight.values()))
+                    if size <= 0:
+                        return
+                unit = [slug for _, slug in zip(range(size), queue)]
+                if not unit:
+                    return
+                print(f"Predicting rating for: {', '.join(unit)}")
+                in_flight[pool.submit(predict_unit, unit, ctx)] = unit
+
+        refill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                unit = in_flight.pop(future)
+                try:
+                    outcomes = future.result()
+                except Exception as e:
+                    print(f"  [x] {', '.join(unit)}: API Error: {e}")
+                    outcomes = []
+                for slug, record in outcomes:
+                    if not record:
+                        continue
+                    print(f"  [+] {slug}: Predicted: {record['predicted_rating']} | Rationale: {record['rationale']}")
+                    predictions[slug] = record
+                    new_predictions += 1
+                    local_predictions += record['annotator'] == KNN_ANNOTATOR
+
+                    # Append to the journal after every successful prediction
+                    journal.append(slug, record)
+                    if dataset:
+                        dataset.upsert_prediction(slug, record)
+            refill()
+
+    if limit is not None and new_predictions >= limit:
+        print(f"\n[!] Reached limit of {args.k} prediction(s). Stopping early.")
+
+    if ctx['embedding_cache'] is not None:
+        ctx['embedding_cache'].evict()
+    if response_cache is not None:
+        response_cache.evict()
+
+    if new_predictions:
+        compact_predictions()
+
     print()
-    for slug, pred in sorted(predictions.items()):
-        print(f"  {slug}: {pred['predicted_rating']} ({pred['annotator']})")
+    get_client().print_stats()
+    if ctx['compactor'] is not None:
+        ctx['compactor'].print_report()
+    if args.mode != 'llm':
+        print(f"kNN answered {local_predictions}/{new_predictions} predictions locally.")
+    print(f"Finished. Made {new_predictions} new predictions.")
+
+
+def add_predict_arguments(parser):
+    """Register the options of the predict command on a parser."""
+    parser.add_argument("stage", nargs='?', choices=['prepare'], help="prepare: precompute the neighbour table for all pending slugs")
+    parser.add_argument("--all", action="store_true", help="Run predictions on all remaining problems")
+    parser.add_argument("-k", type=int, default=1, help="Number of predictions to run (default: 1)")
+    parser.add_argument("--model", type=str, default=DEFAULT_PREDICT_MODEL, help=f"OpenRouter model (default: {DEFAULT_PREDICT_MODEL})")
+    parser.add_argument("--force", action="store_true", help="Regenerate all predictions (ignores existing ones)")
+    parser.add_argument("--no-similar", action="store_true", help="Disable similarity-based reference context")
+    parser.add_argument("--slug", type=str, help="Predict for a specific problem slug")
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of problems predicted in parallel (default: 1)")
+    parser.add_argument("--batch-size", type=int, default=1, help="Problems packed into one chat request (default: 1, unbatched)")
+    parser.add_argument("--rate", type=float, default=5.0, help="Maximum OpenRouter chat requests per second (default: 5)")
+    parser.add_argument("--nprobe", type=int, help="IVF lists probed per query (default: value chosen at build time)")
+    parser.add_argument("--exact", action="store_true", help="Use exact similarity search even if an ANN index exists")
+    parser.add_argument("--meta-concurrency", type=int, default=8, help="Parallel metadata fetches during prefetch (default: 8)")
+    parser.add_argument("--refresh-meta", action="store_true", help="Ignore cached metadata (including cached misses)")
+    parser.add_argument("--no-response-cache", action="store_true", help="Bypass the LLM response cache (no reads or writes)")
+    parser.add_argument("--refresh-responses", action="store_true", help="Ignore cached LLM responses but store the new ones")
+    parser.add_argument("--clear-response-cache", action="store_true", help="Drop all cached LLM responses for --model before running")
+    parser.add_argument("--no-compact", action="store_true", help="Send raw descriptions (no HTML stripping, de-duplication or token budget)")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET, help=f"Estimated token budget per problem prompt (default: {DEFAULT_TOKEN_BUDGET})")
+    parser.add_argument("--mode", choices=["llm", "knn", "cascade"], default="llm",
+                        help="llm: always ask the model; knn: similarity-weighted reference ratings only; "
+                             "cascade: kNN, asking the model only when unsure (default: llm)")
+    parser.add_argument("--max-spread", type=float, default=DEFAULT_MAX_SPREAD, help=f"Cascade: ask the LLM if neighbour ratings spread more than this (default: {DEFAULT_MAX_SPREAD:g})")
+    parser.add_argument("--min-similarity", type=float, default=DEFAULT_MIN_SIMILARITY, help=f"Cascade: ask the LLM if the best reference is less similar than this (default: {DEFAULT_MIN_SIMILARITY:g})")
+    parser.add_argument("--hedge", action="store_true", help="Send a duplicate request when a call is slower than --hedge-percentile of recent calls")
+    parser.add_argument("--hedge-percentile", type=float, default=95.0, help="Latency percentile that triggers a hedge (default: 95)")
+    parser.add_argument("--fallback-model", type=str, help="Model for hedged duplicates (default: same as --model)")
 
 
 def main():
+    from predictions import cmd_list, cmd_compact, add_list_arguments
+
     parser = argparse.ArgumentParser(description="Rating predictor commands")
     subparsers = parser.add_subparsers(dest='command', help='Command to run')
 
     # predict command
     predict_parser = subparsers.add_parser('predict', help='Generate predictions')
-    predict_parser.add_argument("--all", action="store_true", help="Run predictions on all remaining problems")
-    predict_parser.add_argument("-k", type=int, default=1, help="Number of predictions to run (default: 1)")
-    predict_parser.add_argument("--model", type=str, default=DEFAULT_PREDICT_MODEL, help=f"OpenRouter model (default: {DEFAULT_PREDICT_MODEL})")
-    predict_parser.add_argument("--force", action="store_true", help="Regenerate all predictions (ignores existing ones)")
-    predict_parser.add_argument("--no-similar", action="store_true", help="Disable similarity-based reference context")
-    predict_parser.add_argument("--slug", type=str, help="Predict for a specific problem slug")
+    add_predict_arguments(predict_parser)
     predict_parser.set_defaults(func=cmd_predict)
 
-    # list command
+    # list command (implemented in predictions.py, which stays light to import)
     list_parser = subparsers.add_parser('list', help='List all predictions')
+    add_list_arguments(list_parser)
     list_parser.set_defaults(func=cmd_list)
 
+    # compact command
+    compact_parser = subparsers.add_parser('compact', help='Fold the predictions journal into predictions.json')
+    compact_parser.set_defaults(func=cmd_compact)
+
     args = parser.parse_args()
     args.func(args)
 
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Prediction file commands: list and compact.
+
+Kept apart from predict.py so these commands (often run from shell loops)
+do not import requests, numpy or the search stack.
+"""
+
+import argparse
+from core.utils import load_predictions, compact_predictions, PREDICTIONS_PATH
+from core.dataset import Dataset, dataset_enabled
+
+
+def cmd_compact(args):
+    """Fold the predictions journal into predictions.json."""
+    total, entries = compact_predictions()
+    if entries:
+        print(f"Compacted {entries} journal entries into {PREDICTIONS_PATH.name} ({total} predictions).")
+    else:
+        print(f"Journal is empty, {PREDICTIONS_PATH.name} is up to date ({total} predictions).")
+
+
+def cmd_list(args):
+    """List all predictions, optionally filtered by model and rating range."""
+    model = getattr(args, 'model', None)
+    below = getattr(args, 'below', None)
+    above = getattr(args, 'above', None)
+
+    if dataset_enabled():
+        # Indexed query against the SQLite dataset
+        rows = Dataset().query_predictions(model=model, below=below, above=above)
+    else:
+        rows = [
+            (slug, pred) for slug, pred in sorted(load_predictions().items())
+            if (not model or pred.get('annotator') == model)
+            and (below is None or pred['predicted_rating'] < below)
+            and (above is None or pred['predicted_rating'] > above)
+        ]
+
+    print(f"Total predictions: {len(rows)}")
+    print()
+    for slug, pred in rows:
+        print(f"  {slug}: {pred['predicted_rating']} ({pred['annotator']})")
+
+
+def add_list_arguments(parser):
+    """Register the filters of the list command on a parser."""
+    parser.add_argument("--model", type=str, help="Only predictions made by this model")
+    parser.add_argument("--below", type=int, help="Only predicted ratings below this value")
+    parser.add_argument("--above", type=int, help="Only predicted ratings above this value")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prediction file commands")
+    subparsers = parser.add_subparsers(dest='command', help='Command to run')
+
+    list_parser = subparsers.add_parser('list', help='List all predictions')
+    add_list_arguments(list_parser)
+    list_parser.set_defaults(func=cmd_list)
+
+    compact_parser = subparsers.add_parser('compact', help='Fold the predictions journal into predictions.json')
+    compact_parser.set_defaults(func=cmd_compact)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
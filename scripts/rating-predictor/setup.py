@@ -5,19 +5,64 @@ Setup commands: join zerotrac and generate embeddings.
 
 import argparse
 import json
-from pathlib import Path
+import os
+import time
 from core.utils import (
     get_api_key,
     load_zerotrac,
-    load_merged_problems,
     build_embedding_text,
-    generate_embedding,
+    text_hash,
+    generate_embeddings_batched,
     EMBEDDINGS_MODEL,
-    ZEROTRAC_PATH,
+    LOCAL_EMBEDDINGS_MODEL,
+    LOCAL_EMBEDDER_PATH,
     MERGED_RATING_PATH,
     EMBEDDINGS_PATH,
+    EMBEDDINGS_META_PATH,
+    LEGACY_EMBEDDINGS_PATH,
     RAW_DATA_PATH,
+    DATASET_DB_PATH,
+    load_predictions,
+    iter_json_array,
+    write_json_atomic,
+    write_count_sidecar,
+    JOIN_CHANGES_PATH,
+    ANN_INDEX_PATH,
 )
+from core.store import write_embedding_store, open_embedding_store, convert_legacy_embeddings, store_fingerprint
+from core.cache import EmbeddingCache
+from core.http_client import get_client
+from core.dataset import Dataset, dataset_enabled
+from core.taxonomy_index import file_sha256
+from core.ann import IVFIndex, recall_report, choose_nprobe
+from core.local_embedder import HashedTfidfEmbedder
+
+
+def join_entry(problem, zt):
+    """Build one merged_with_rating.json entry."""
+    return {
+        'problem_slug': problem['problem_slug'],
+        'title': problem['title'],
+        'difficulty': problem['difficulty'],
+        'topics': problem.get('topics', []),
+        'description': problem.get('description', ''),
+        'constraints': problem.get('constraints', []),
+        'hints': problem.get('hints', []),
+        'Rating': zt['Rating'],
+        'ContestSlug': zt.get('ContestSlug', ''),
+        'ProblemIndex': zt.get('ProblemIndex', ''),
+    }
+
+
+def entry_hash(entry):
+    return text_hash(json.dumps(entry, sort_keys=True, ensure_ascii=False))
+
+
+def read_join_index(path=MERGED_RATING_PATH):
+    """Stream a previous join output into slug -> (Rating, entry hash), or None if absent."""
+    if not path.exists():
+        return None
+    return {e['problem_slug']: (e['Rating'], entry_hash(e)) for e in iter_json_array(path)}
 
 
 def cmd_join(args):
@@ -26,107 +71,261 @@ def cmd_join(args):
     print()
 
     zerotrac_data = load_zerotrac()
-    with open(RAW_DATA_PATH, 'r') as f:
-        merged_data = json.load(f)
-
     print(f"zerotrac: {len(zerotrac_data)} entries")
-    print(f"merged_problems: {len(merged_data['questions'])} entries")
-    print()
 
     # Create lookup from TitleSlug to zerotrac entry
     zerotrac_lookup = {entry['TitleSlug']: entry for entry in zerotrac_data}
+    previous = read_join_index()
+
+    changes = {"added": [], "removed": [], "rerated": [], "changed": []}
+    seen = set()
+    questions = 0
+    tmp_path = MERGED_RATING_PATH.with_name(MERGED_RATING_PATH.name + '.tmp')
+    MERGED_RATING_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    # Join: stream questions, keep only problems that exist in zerotrac
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        out.write('[')
+        for problem in iter_json_array(RAW_DATA_PATH, 'questions'):
+            questions += 1
+            slug = problem['problem_slug']
+            if slug not in zerotrac_lookup:
+                continue
+            entry = join_entry(problem, zerotrac_lookup[slug])
+            out.write((',' if seen else '') + json.dumps(entry, separators=(',', ':'), ensure_ascii=False))
+            seen.add(slug)
+
+            if previous is None:
+                continue
+            if slug not in previous:
+                changes["added"].append(slug)
+                continue
+            old_rating, old_hash = previous[slug]
+            if old_rating != entry['Rating']:
+                changes["rerated"].append({"slug": slug, "old": old_rating, "new": entry['Rating']})
+            elif old_hash != entry_hash(entry):
+                changes["changed"].append(slug)
+        out.write(']')
+        out.flush()
+        os.fsync(out.fileno())
+
+    if previous is not None:
+        changes["removed"] = sorted(set(previous) - seen)
+    else:
+        changes["added"] = sorted(seen)
 
-    # Join: keep only problems that exist in zerotrac
-    merged_with_rating = []
-    for problem in merged_data['questions']:
-        slug = problem['problem_slug']
-        if slug in zerotrac_lookup:
-            zt = zerotrac_lookup[slug]
-            merged_entry = {
-                'problem_slug': slug,
-                'title': problem['title'],
-                'difficulty': problem['difficulty'],
-                'topics': problem.get('topics', []),
-                'description': problem.get('description', ''),
-                'constraints': problem.get('constraints', []),
-                'hints': problem.get('hints', []),
-                'Rating': zt['Rating'],
-                'ContestSlug': zt.get('ContestSlug', ''),
-                'ProblemIndex': zt.get('ProblemIndex', ''),
-            }
-            merged_with_rating.append(merged_entry)
-
-    print(f"Joined: {len(merged_with_rating)} entries with ratings")
+    print(f"merged_problems: {questions} entries")
+    print()
+    print(f"Joined: {len(seen)} entries with ratings")
+    print(f"  Added: {len(changes['added'])}, removed: {len(changes['removed'])}, "
+          f"re-rated: {len(changes['rerated'])}, other changes: {len(changes['changed'])}")
     print()
 
-    with open(MERGED_RATING_PATH, 'w') as f:
-        json.dump(merged_with_rating, f, indent=2)
+    unchanged = MERGED_RATING_PATH.exists() and file_sha256(tmp_path) == file_sha256(MERGED_RATING_PATH)
+    if unchanged:
+        tmp_path.unlink()
+        write_count_sidecar(MERGED_RATING_PATH, len(seen))
+        # Keep the previous change set: later stages may not have consumed it yet
+        print(f"No changes, left {MERGED_RATING_PATH} and {JOIN_CHANGES_PATH} untouched.")
+        return
 
+    os.replace(tmp_path, MERGED_RATING_PATH)
     print(f"Saved to: {MERGED_RATING_PATH}")
+    write_count_sidecar(MERGED_RATING_PATH, len(seen))
 
+    # Machine-readable change set for later stages
+    write_json_atomic(JOIN_CHANGES_PATH, {"count": len(seen), **changes}, indent=2)
+    print(f"Change set: {JOIN_CHANGES_PATH}")
 
-def cmd_embeddings(args):
-    """Generate embeddings for merged_with_rating.json."""
-    import time
-    BATCH_SIZE = 100
 
+def plan_embedding_build(problems, texts, header, stored_problems, model=EMBEDDINGS_MODEL, full=False):
+    """
+    Diff the current problems against the existing store.
+
+    A stored vector is reused when the slug is present with the same embedding
+    text hash (and the store was built with the same model).
+
+    Returns:
+        (reuse, changed) where reuse maps row index -> stored row index and
+        changed is the list of row indices that need a new embedding
+    """
+    stored = {}
+    if not full and header and header.get('model') == model:
+        stored = {p['problem_slug']: (p.get('text_hash'), i) for i, p in enumerate(stored_problems)}
+
+    reuse, changed = {}, []
+    for i, (problem, text) in enumerate(zip(problems, texts)):
+        entry = stored.get(problem['problem_slug'])
+        if entry and entry[0] == text_hash(text):
+            reuse[i] = entry[1]
+        else:
+            changed.append(i)
+    return reuse, changed
+
+
+def cmd_embeddings(args):
+    """Generate embeddings for merged_with_rating.json (incrementally by default)."""
     print("Generating embeddings...")
     print()
 
     with open(MERGED_RATING_PATH, 'r') as f:
         problems = json.load(f)
 
-    print(f"Found {len(problems)} problems to generate embeddings for.")
+    texts = [build_embedding_text(p) for p in problems]
+    for problem, text in zip(problems, texts):
+        problem['text_hash'] = text_hash(text)
+
+    model = LOCAL_EMBEDDINGS_MODEL if args.embedder == 'local' else EMBEDDINGS_MODEL
+    header, stored_problems, stored_vectors = open_embedding_store()
+    reuse, changed = plan_embedding_build(problems, texts, header, stored_problems, model, full=args.full)
+    current_slugs = {p['problem_slug'] for p in problems}
+    removed = sum(1 for p in stored_problems or [] if p['problem_slug'] not in current_slugs)
+
+    print(f"Found {len(problems)} problems: {len(reuse)} unchanged, {len(changed)} new or changed, {removed} removed.")
+    if not changed and not removed and len(reuse) == (header or {}).get('count'):
+        print("Embedding store is up to date.")
+        if args.ann == 'ivf':
+            build_ann_index(args.nlist)
+        return
+
+    if args.embedder == 'local':
+        all_embeddings = embed_locally(texts)
+    else:
+        all_embeddings = embed_with_api(args, texts, reuse, changed, stored_vectors)
+        if all_embeddings is None:
+            return
+
+    dims = {len(emb) for emb in all_embeddings}
+    if len(dims) != 1:
+        print(f"  [x] Inconsistent embedding dimensions: {sorted(dims)}")
+        return
+
+    write_embedding_store(problems, all_embeddings, model)
+    if dataset_enabled():
+        Dataset().replace_references(problems, all_embeddings, model, store_fingerprint())
+    if args.ann == 'ivf':
+        build_ann_index(args.nlist)
+
     print()
+    if args.embedder == 'api':
+        get_client().print_stats()
+    print(f"Saved embeddings to: {EMBEDDINGS_PATH}")
+    print(f"Saved metadata to: {EMBEDDINGS_META_PATH}")
 
-    texts = [build_embedding_text(p) for p in problems]
 
-    all_embeddings = []
-    for i in range(0, len(texts), BATCH_SIZE):
-        batch_texts = texts[i:i + BATCH_SIZE]
-        print(f"  Generating embeddings {i+1}-{min(i+BATCH_SIZE, len(texts))}/{len(texts)}...")
+def embed_with_api(args, texts, reuse, changed, stored_vectors):
+    """
+    Embed the changed texts through OpenRouter, reusing stored and cached vectors.
 
-        batch_embeddings = []
-        for text in batch_texts:
-            # Generate one at a time for simplicity
-            emb = generate_embedding(get_api_key(), text)
-            if emb:
-                batch_embeddings.append(emb)
-            else:
-                batch_embeddings.append([0.0] * 1024)  # Fallback
+    Returns:
+        List of vectors for all texts, or None if a batch failed
+    """
+    # The cache doubles as the checkpoint: every completed batch is committed
+    # to it, so an interrupted run resumes from where it stopped.
+    cache = EmbeddingCache()
+    changed_texts = [texts[i] for i in changed]
+    cached = {} if args.full else cache.get_many(EMBEDDINGS_MODEL, changed_texts)
+    missing = list(dict.fromkeys(t for t in changed_texts if t not in cached))
+    print(f"  {len(changed_texts) - len(missing)} embeddings found in cache, {len(missing)} to generate.")
+    print(f"  Batch size: {args.batch_size}, concurrency: {args.concurrency}")
 
-        all_embeddings.extend(batch_embeddings)
+    api_key = get_api_key() if missing else None
+    try:
+        generated = generate_embeddings_batched(
+            api_key, missing,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            retries=args.retries,
+            on_batch=lambda batch_texts, vectors: cache.put_many(EMBEDDINGS_MODEL, batch_texts, vectors),
+        )
+    except RuntimeError as e:
+        print(f"  [x] {e}")
+        print("  [x] Embedding store was not written; re-run to resume (completed batches are cached).")
+        return None
+    finally:
+        cache.evict()
 
-    if len(all_embeddings) != len(problems):
-        print(f"  [x] Mismatch: got {len(all_embeddings)} embeddings for {len(problems)} problems")
+    cached.update(zip(missing, generated))
+    return [
+        stored_vectors[reuse[i]] if i in reuse else cached[texts[i]]
+        for i in range(len(texts))
+    ]
+
+
+def embed_locally(texts):
+    """
+    Embed every text with the offline hashed TF-IDF backend.
+
+    IDF weights depend on the whole corpus, so all vectors are recomputed
+    (no API key or network needed).
+    """
+    start = time.perf_counter()
+    embedder = HashedTfidfEmbedder.fit(texts)
+    vectors = embedder.embed(texts)
+    embedder.save()
+    print(f"  Embedded {len(texts)} problems locally (dim {embedder.dim}) in {time.perf_counter() - start:.1f}s")
+    print(f"  Saved IDF weights to: {LOCAL_EMBEDDER_PATH}")
+    return vectors
+
+
+def build_ann_index(n_lists=None):
+    """Build the IVF index over the current store and report recall@5 against the exact scan."""
+    header, _, vectors = open_embedding_store()
+    print()
+    print(f"Building IVF index over {header['count']} vectors...")
+    index = IVFIndex.build(vectors, n_lists=n_lists)
+    print(f"  {index.n_lists} lists")
+
+    report = recall_report(index)
+    for nprobe, recall, latency in report:
+        print(f"  nprobe={nprobe:<3} recall@5={recall:.3f}  {latency:.3f} ms/query")
+    index.nprobe = choose_nprobe(report)
+    index.save(fingerprint=store_fingerprint())
+    print(f"Saved ANN index (default nprobe={index.nprobe}) to: {ANN_INDEX_PATH}")
+
+
+def cmd_convert(args):
+    """Convert a legacy zerotrac_embeddings.json into the binary embedding store."""
+    if not LEGACY_EMBEDDINGS_PATH.exists():
+        print(f"  [x] {LEGACY_EMBEDDINGS_PATH} not found, nothing to convert.")
         return
 
-    output = {
-        "model": EMBEDDINGS_MODEL,
-        "count": len(problems),
-        "problems": []
-    }
+    print(f"Converting {LEGACY_EMBEDDINGS_PATH.name}...")
+    header = convert_legacy_embeddings()
+    print(f"Saved {header['count']} embeddings (dim {header['dim']}, model {header['model']}) to: {EMBEDDINGS_PATH}")
+
+
+def cmd_db(args):
+    """Create or refresh the optional SQLite dataset from the current files."""
+    print(f"Syncing {DATASET_DB_PATH.name}...")
+    dataset = Dataset()
 
-    for problem, embedding in zip(problems, all_embeddings):
-        output["problems"].append({
-            "problem_slug": problem['problem_slug'],
-            "title": problem['title'],
-            "difficulty": problem['difficulty'],
-            "topics": problem['topics'],
-            "description": problem.get('description', ''),
-            "constraints": problem.get('constraints', []),
-            "hints": problem.get('hints', []),
-            "Rating": problem['Rating'],
-            "ContestSlug": problem.get('ContestSlug', ''),
-            "ProblemIndex": problem.get('ProblemIndex', ''),
-            "embedding": embedding,
-        })
-
-    with open(EMBEDDINGS_PATH, 'w') as f:
-        json.dump(output, f, indent=2)
+    header, problems, vectors = open_embedding_store()
+    if problems is not None:
+        dataset.replace_references(problems, vectors, header['model'], store_fingerprint())
+        print(f"  References: {len(problems)} (embeddings: {header['model']})")
+    else:
+        print("  [!] No embedding store found, references not synced.")
 
+    predictions = load_predictions()
+    dataset.upsert_predictions(predictions.items())
+    print(f"  Predictions: {len(predictions)}")
+
+    counts = dataset.counts()
     print()
-    print(f"Saved embeddings to: {EMBEDDINGS_PATH}")
+    print(f"Saved to: {DATASET_DB_PATH} ({', '.join(f'{k}={v}' for k, v in counts.items())})")
+    print("predict, list and status will now use it.")
+
+
+def add_embedding_arguments(parser):
+    """Register the options of the embeddings command on a parser."""
+    parser.add_argument("--batch-size", type=int, default=100, help="Texts per embeddings request (default: 100)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum requests in flight (default: 4)")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per failed batch (default: 3)")
+    parser.add_argument("--full", action="store_true", help="Re-embed every problem, ignoring the existing store and cache")
+    parser.add_argument("--embedder", choices=["api", "local"], default="api", help="api: OpenRouter embeddings; local: offline hashed TF-IDF (default: api)")
+    parser.add_argument("--ann", choices=["none", "ivf"], default="none", help="Also build an approximate nearest-neighbour index (default: none)")
+    parser.add_argument("--nlist", type=int, help="Number of IVF lists (default: ~sqrt(count))")
 
 
 def main():
@@ -139,8 +338,17 @@ def main():
 
     # embeddings command
     emb_parser = subparsers.add_parser('embeddings', help='Generate embeddings')
+    add_embedding_arguments(emb_parser)
     emb_parser.set_defaults(func=cmd_embeddings)
 
+    # convert command
+    convert_parser = subparsers.add_parser('convert', help='Convert legacy JSON embeddings to the binary store')
+    convert_parser.set_defaults(func=cmd_convert)
+
+    # db command
+    db_parser = subparsers.add_parser('db', help='Create or refresh the optional SQLite dataset')
+    db_parser.set_defaults(func=cmd_db)
+
     args = parser.parse_args()
     args.func(args)
 
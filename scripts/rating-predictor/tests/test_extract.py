@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+A full extraction of the unchanged raw pages must reproduce the committed
+taxonomy graph byte for byte (titles, descriptions, kept sections and
+problem lists all carried over or re-derived identically).
+
+Run from scripts/rating-predictor: python3 -m unittest discover tests
+"""
+
+import json
+import unittest
+from core.extraction import load_routes
+from core.utils import RAW_PAGES_DIR, TAXONOMY_MAPPING_PATH
+from extract import DEFAULT_OUTPUT, GraphBuilder, extract_pages, index_previous, load_graph, pages_in_order
+
+
+@unittest.skipUnless(RAW_PAGES_DIR.exists() and DEFAULT_OUTPUT.exists(), "raw pages or graph not checked out")
+class FullExtractTest(unittest.TestCase):
+    def rebuild(self, workers):
+        routes = load_routes(TAXONOMY_MAPPING_PATH)
+        pages = pages_in_order(routes)
+        previous = load_graph(DEFAULT_OUTPUT)
+        nodes, problems = index_previous(previous)
+        # No merged_problems.json/zerotrac.json: titles and ratings come from the graph itself
+        builder = GraphBuilder(routes, nodes, problems, None, {})
+        for page_routes, result in zip(pages.values(), extract_pages(pages, RAW_PAGES_DIR, workers)):
+            self.assertIsNotNone(result)
+            builder.add_page(page_routes, result)
+        return builder
+
+    def test_reproduces_committed_graph(self):
+        builder = self.rebuild(workers=1)
+        self.assertEqual(json.dumps(builder.graph(), indent=2), DEFAULT_OUTPUT.read_text())
+        self.assertEqual(builder.stale, 0)
+
+    def test_worker_count_does_not_change_output(self):
+        self.assertEqual(json.dumps(self.rebuild(workers=2).graph(), indent=2), DEFAULT_OUTPUT.read_text())
+
+
+if __name__ == '__main__':
+    unittest.main()
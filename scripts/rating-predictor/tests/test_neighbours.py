@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Neighbour-table freshness: entries computed from an older embedding text
+must be treated as uncovered so the slug falls back to live search.
+
+Run from scripts/rating-predictor: python3 -m unittest discover tests
+"""
+
+import unittest
+from core.utils import build_embedding_text, text_hash
+from core.neighbours import current_entry
+from predict import table_neighbours
+
+META = {
+    'problem_slug': 'convert-bst-to-greater-tree',
+    'title': 'Convert BST to Greater Tree',
+    'difficulty': 'Medium',
+    'topics': ['Tree'],
+    'description': '<p>Given the root of a BST...</p>',
+}
+REFERENCE = {'problem_slug': 'two-sum', 'title': 'Two Sum', 'difficulty': 'Easy', 'Rating': 1200}
+
+
+def table_for(meta):
+    return {
+        meta['problem_slug']: {
+            "text_hash": text_hash(build_embedding_text(meta)),
+            "neighbours": [["two-sum", 0.9]],
+        }
+    }
+
+
+class CurrentEntryTest(unittest.TestCase):
+    def setUp(self):
+        self.stale_meta = dict(META, description='<p>Given the root of a binary search tree, updated.</p>')
+        self.ctx = {'neighbours': table_for(META), 'references': {'two-sum': REFERENCE}}
+
+    def test_fresh_entry_is_used(self):
+        self.assertIsNotNone(current_entry(self.ctx['neighbours'], META['problem_slug'], META))
+        refs = table_neighbours(META['problem_slug'], META, self.ctx)
+        self.assertEqual([r['problem_slug'] for r in refs], ['two-sum'])
+        self.assertEqual(refs[0]['similarity'], 0.9)
+
+    def test_stale_entry_is_uncovered(self):
+        slug = META['problem_slug']
+        self.assertIsNone(current_entry(self.ctx['neighbours'], slug, self.stale_meta))
+        self.assertIsNone(table_neighbours(slug, self.stale_meta, self.ctx))
+
+    def test_missing_table_or_entry(self):
+        self.assertIsNone(current_entry(None, META['problem_slug'], META))
+        self.assertIsNone(current_entry(self.ctx['neighbours'], 'two-sum', REFERENCE))
+
+
+if __name__ == '__main__':
+    unittest.main()